@@ -1,15 +1,18 @@
-from typing import Literal
+import mmap
+from typing import Literal, Union
 
 
 __version__ = "0.0.2"
 
 Endianness = Literal["little", "big"]
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
 
 from . import ncducolors  # noqa: E402
 from .attribute import Attribute  # noqa: E402
 from .config import Config  # noqa: E402
 from .key import Key  # noqa: E402
 from .ncducolors import NcduColors  # noqa: E402
+from .patch import Patch  # noqa: E402
 from .sequence import Sequence  # noqa: E402
 from .theme import Theme  # noqa: E402
 from .color import Color  # noqa: E402
@@ -1,24 +1,51 @@
 import argparse
+import contextlib
 import json
+import os
 import shutil
+import signal
 import sys
-from io import TextIOWrapper
+from io import BufferedReader, BufferedWriter, TextIOWrapper
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 
 from . import __version__
+from ncducolors.archive import patch_archive
+from ncducolors.artifacts import ArtifactStore
+from ncducolors.backup import BackupStore
+from ncducolors.batch import apply_many, apply_target, audit_many, read_targets, restore_target, run_one, write_prometheus
+from ncducolors.cache import Cache
 from ncducolors.config import Config
+from ncducolors.discover import discover
+from ncducolors.hooks import Timings
+from ncducolors.journal import apply_transaction, resume, rollback
 from ncducolors.ncducolors import NcduColors
+from ncducolors.patch import Patch, read_config
+from ncducolors.search import Matcher
+from ncducolors.server import Registry, Server
+from ncducolors.watch import watch
 
 
 HELP_MESSAGE = """
 NcduColors dumps and patches pre-2.0 Ncdu's internal themes.
 
 Usage:
-  ncducolors [--ncdu PATH] extract-default-config <FILE> [--compact]
-  ncducolors [--ncdu PATH] apply-config <FILE>
-  ncducolors [--ncdu PATH] revert (--offset INT | --config FILE)
-  ncducolors [--ncdu PATH] dump-internal-default-config [--compact]
+  ncducolors [OPTIONS] extract-default-config <FILE> [--compact]
+  ncducolors [OPTIONS] compile <FILE> <PATCH>
+  ncducolors [OPTIONS] apply-config <FILE> [--fsync] [--atomic] [--artifacts]
+  ncducolors [OPTIONS] apply-config <FILE> --targets (FILE | -) [--workers INT] [--fsync]
+                                            [--atomic [--artifacts] | --journal FILE]
+  ncducolors [OPTIONS] (resume | rollback) <JOURNAL>
+  ncducolors [OPTIONS] revert [--offset INT | --config FILE] [--fsync] [--atomic]
+  ncducolors [OPTIONS] identify [--config FILE]...
+  ncducolors [OPTIONS] discover <ROOT>... [--workers INT]
+  ncducolors [OPTIONS] audit --config FILE [--targets (FILE | -)] [--workers INT] [--prometheus FILE]
+  ncducolors [OPTIONS] serve --socket PATH
+  ncducolors [OPTIONS] watch --config FILE [--targets (FILE | -)]
+  ncducolors [OPTIONS] patch-archive <FILE> <INPUT> <OUTPUT> [--member PATH]
+  ncducolors [OPTIONS] backups (list | restore [<PATH>...] [--applied] | gc)
+  ncducolors [OPTIONS] cache stats
+  ncducolors [OPTIONS] dump-internal-default-config [--compact]
              [--with[out]-darkbg] [--(little|big)-endian]
   ncducolors (-h | --help)
   ncducolors --version
@@ -27,20 +54,69 @@ Actions:
   extract-default-config         Extracts Ncdu's configuration, its two/three themes,
                                  colors and attributes. Works only on non-patched binaries.
                                  (make a backup of it before proceding!)
+  compile                        Compiles a config to a binary patch, faster to apply
+                                 (with 'apply-config', 'audit' and 'watch' too).
   apply-config                   Overwrites the binary configuration file with the one
-                                 provided.
+                                 provided (a config or a compiled patch). With --targets,
+                                 it does so on every Ncdu binary listed, printing one
+                                 JSON line per binary.
+  resume                         Finishes the transaction of an 'apply-config --journal'
+                                 which was interrupted (or failed for some binaries).
+  rollback                       Restores the binaries patched by the last transaction of
+                                 an 'apply-config --journal'.
   revert                         Does the same thing of apply-config, but uses
                                  NcduColors' colors and attributes. In other words,
                                  everything else than "path" and "offset" is discarded.
+                                 If omitted, the offset is looked for in the binary.
+  identify                       Tells whether Ncdu is unpatched, patched with one of the
+                                 given configs, or unknown, listing every theme table found.
+  discover                       Looks for every Ncdu binary under the given directories,
+                                 printing one JSON line per binary (the binaries found
+                                 are never run).
+  audit                          Tells, without writing anything, whether the config of Ncdu
+                                 (or of every binary listed with --targets) is the given one,
+                                 printing one JSON line per binary.
+  serve                          Answers extract, apply, revert and audit requests (one JSON
+                                 object per line) on a Unix socket, keeping the binaries'
+                                 state between requests.
+  watch                          Applies the config to Ncdu (or to every binary listed with
+                                 --targets), then again whenever it is replaced or rewritten
+                                 (e.g. by a package upgrade), printing one JSON line per apply.
+  patch-archive                  Applies the config to the Ncdu binaries inside a tar archive
+                                 (optionally gzip, xz or bzip2 compressed) or a .deb package,
+                                 streaming it to a new archive ('-' for the standard input and
+                                 output), without extracting anything else. In a .deb package,
+                                 the md5sums of the control archive is updated too.
+  backups                        Lists the backups of the theme tables (taken before every
+                                 write), restores the original (or the last applied) tables
+                                 of the given binaries (default: all of them), or deletes
+                                 the backups of the binaries which don't exist anymore.
+  cache                          Tells how the artifact store (see --artifacts) is doing: its
+                                 size, hit rate and bytes saved.
   dump-internal-default-config   Should be used in exceptional cases only
                                  (last-resort recovery, analysis, etc...).
                                  It uses NcduColors' (not Ncdu's) binaries.
 
-Options:
+Options ([OPTIONS] being --ncdu, --no-exec, --no-cache, --no-backup, --search-workers,
+--max-memory and --timings):
   -h --help        Show this screen.
   --version        Show version and exit.
   --ncdu PATH      Use the provided Ncdu binary as reference for some default values
                    (default: Ncdu is automatically recognised).
+  --no-exec        Never run Ncdu: its version is read from the binary only
+                   (default: run 'ncdu --version' if no version string is found).
+  --no-cache       Don't read nor update the cache of the binaries' versions and
+                   offsets (default: $XDG_CACHE_HOME/ncducolors/binaries.json).
+  --no-backup      Don't back up the theme tables before overwriting them
+                   (default: in $XDG_DATA_HOME/ncducolors/backups).
+  --search-workers INT
+                   Search the binary with this many processes, each on its own chunks,
+                   if it's big enough (default: 1). Used by single-binary actions.
+  --max-memory MIB Bound the part of the binary in memory while searching it, whatever
+                   the number of search workers (default: 1 MiB per worker).
+  --timings        Print (as JSON, to the standard error) the duration, the number of calls
+                   and the bytes read and written of each phase: parse, version, exec,
+                   symbols, search, decode and write.
   --big-endian     Force the dumping of the internal default config used by Ncdu on
                    big-endian machines (default: depends on the Ncdu binary).
   --little-endian  Like --big-endian, but for little endian binaries.
@@ -48,13 +124,36 @@ Options:
   --without-darkbg Force the dumping of the internal default config used by Ncdu < 1.7.
   --compact        Disable the JSON indentation.
   --offset INT     Use the provided offset (it's binary-dependent - be careful).
+  --fsync          Flush the changed bytes to the disk before exiting.
+  --atomic         Patch a copy of the binary (a reflink, where the filesystem supports
+                   it), then rename it over the original: the binary is never seen half-
+                   patched, and it can be patched while running.
+  --targets FILE   File listing the paths of the Ncdu binaries, one per line ('-' for
+                   the standard input).
+  --workers INT    Number of binaries (or directories) to process concurrently
+                   (default: 8).
+  --journal FILE   Apply the config as a transaction: the changes are written to this
+                   journal before any binary is patched, so that the transaction can be
+                   resumed or rolled back.
+  --artifacts      Keep the patched binaries in a store, keyed by the original binary and the
+                   config: the next identical binary is replaced with a reflink (or a copy) of
+                   the stored one (default: $XDG_CACHE_HOME/ncducolors/artifacts).
+  --prometheus FILE
+                   Also write the results of the audit in the Prometheus text format,
+                   for node_exporter's textfile collector.
+  --socket PATH    Path of the Unix socket to listen on.
+  --member PATH    Path (in the archive) of the Ncdu binary to patch (default: every
+                   ELF file named 'ncdu'; other files, such as wrapper scripts, are copied).
+  --applied        Restore the last applied table rather than the original one (e.g. to
+                   patch again a binary after an upgrade).
 
 How to use this software:
 1. Use 'extract-default-config' to extract your config to a JSON file.
 2. Make a backup of the mentioned JSON file.
 3. Use your editor of choice to edit the *values* (also: DON'T edit "offset").
 4. Use 'apply-config' to apply the new configuration file.
-5. Done. Launch Ncdu. Or re-start from step 3 / 'revert' using step 2's backup.
+5. Done. Launch Ncdu. Or re-start from step 3 / 'revert' using step 2's backup
+   (or 'backups restore').
 
 Config keys and values:
 - "ncdu" is the Path to the Ncdu binary and "offset" depends on it. Don't touch them.
@@ -108,36 +207,274 @@ class Handlers:
             file.write(json.dumps(extracted_default_config.as_dict(), **kwargs))
 
         if isatty:
-            print("Config extracted successfully.")
+            section = ncdu.elf.section_at(extracted_default_config.offset)
+
+            print(f"Config extracted successfully (offset {extracted_default_config.offset:#x}, "
+                  f"section {section.name if section is not None else 'unknown'}).")
+
+    @staticmethod
+    def compile(config: TextIOWrapper, patch: BufferedWriter, execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]):
+        compiled = Patch.compile(Config.from_buffer(config))
+
+        with patch as file:
+            file.write(compiled.as_bytes())
 
     @staticmethod
-    def apply_config(ncdu: NcduColors, config: TextIOWrapper):
-        new_config = Config.from_buffer(config)
+    def apply_config(ncdu: NcduColors, config: BufferedReader, fsync: bool = False, atomic: bool = False, artifacts: bool = False):
+        new_config = read_config(config)
+
+        if artifacts:
+            result = apply_target(ncdu, new_config, fsync=fsync, atomic=atomic, artifacts=(store := ArtifactStore()))
+
+            store.save()
+
+            if result.get("artifact") not in (None, "stored"):
+                return print(f"Config applied successfully (from the artifact store, {result['artifact']}).")
 
-        if ncdu.apply_config(new_config=new_config):
-            print("Config applied successfully.")
+            written = result["bytes_written"]
+        elif isinstance(new_config, Patch):
+            written = ncdu.apply_patch(patch=new_config, fsync=fsync, atomic=atomic)
+        else:
+            written = ncdu.apply_config(new_config=new_config, fsync=fsync, atomic=atomic)
+
+        if written:
+            print(f"Config applied successfully ({written} bytes written).")
         else:
             print("Config is already applied.")
 
     @staticmethod
-    def revert(ncdu: NcduColors, config: Optional[TextIOWrapper] = None, offset: Optional[int] = None):
+    def apply_config_batch(config: BufferedReader, targets: Iterable[Path], workers: int, execute: bool, cache: Optional[Cache],
+                           backups: Optional[BackupStore], fsync: bool = False, atomic: bool = False, journal: Optional[Path] = None,
+                           artifacts: bool = False) -> int:
+        new_config = read_config(config)
+
+        failures = 0
+
+        if cache is not None:
+            cache.autosave = False
+
+        if backups is not None:
+            backups.autosave = False
+
+        if journal is not None and atomic:
+            raise ValueError("A transaction (--journal) can't be atomic (--atomic).")
+
+        if journal is not None and artifacts:
+            raise ValueError("A transaction (--journal) can't use the artifact store (--artifacts).")
+
+        store = ArtifactStore(autosave=False) if artifacts else None
+
+        if journal is not None:
+            results = apply_transaction(targets, new_config, journal, workers=workers, execute=execute, cache=cache, backups=backups,
+                                        fsync=fsync)
+        else:
+            results = apply_many(targets, new_config, workers=workers, execute=execute, cache=cache, backups=backups, fsync=fsync,
+                                 atomic=atomic, artifacts=store)
+
+        # The backups of the binaries already patched are saved even if the batch is interrupted
+        try:
+            for result in results:
+                failures += result["status"] == "error"
+
+                print(json.dumps(result), flush=True)
+        finally:
+            if cache is not None:
+                cache.save()
+
+            if backups is not None:
+                backups.save()
+
+            if store is not None:
+                store.save()
+
+        return 1 if failures else 0
+
+    @staticmethod
+    def resume(journal: Path, workers: int, execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]) -> int:
+        failures = 0
+
+        for result in resume(journal, workers=workers):
+            failures += result["status"] == "error"
+
+            print(json.dumps(result), flush=True)
+
+        return 1 if failures else 0
+
+    @staticmethod
+    def rollback(journal: Path, execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]) -> int:
+        failures = 0
+
+        for result in rollback(journal):
+            failures += result["status"] == "error"
+
+            print(json.dumps(result), flush=True)
+
+        return 1 if failures else 0
+
+    @staticmethod
+    def revert(ncdu: NcduColors, config: Optional[TextIOWrapper] = None, offset: Optional[int] = None, fsync: bool = False,
+               atomic: bool = False):
         internal_default_config: Config = NcduColors.dump_internal_default_config(
             ncdu=ncdu.ncdu,
-            offset=offset or Config.from_buffer(config).offset,
+            offset=offset if offset is not None else Config.from_buffer(config).offset if config is not None else None,
             with_darkbg=ncdu.supports_darkbg,
             byteorder=ncdu.byteorder
         )
 
-        if ncdu.apply_config(new_config=internal_default_config):
-            print("Ncdu defaults reverted successfully.")
+        if written := ncdu.apply_config(new_config=internal_default_config, fsync=fsync, atomic=atomic):
+            print(f"Ncdu defaults reverted successfully ({written} bytes written).")
         else:
             print("Ncdu has already been reverted to its defaults.")
 
+    @staticmethod
+    def identify(ncdu: NcduColors, config: Optional[list[TextIOWrapper]] = None):
+        fingerprints = {Path(file.name).name: Config.from_buffer(file) for file in config or ()}
+
+        if not (matches := ncdu.scan(Matcher(fingerprints=fingerprints))):
+            print("Unknown: no known theme table was found.")
+
+        for match in matches:
+            section = ncdu.elf.section_at(match.offset)
+
+            print(f"Offset {match.offset:#x} ({section.name if section is not None else 'unknown section'}): {match.describe()}")
+
+    @staticmethod
+    def discover(roots: list[Path], workers: int, execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]):
+        if cache is not None:
+            cache.autosave = False
+
+        for result in discover(roots, workers=workers, cache=cache):
+            print(json.dumps(result), flush=True)
+
+        if cache is not None:
+            cache.save()
+
+    @staticmethod
+    def audit(config: BufferedReader, targets: Iterable[Path], workers: int, execute: bool, cache: Optional[Cache],
+              backups: Optional[BackupStore], prometheus: Optional[Path] = None) -> int:
+        expected_config = read_config(config)
+
+        results = []
+
+        if cache is not None:
+            cache.autosave = False
+
+        for result in audit_many(targets, expected_config, workers=workers, execute=execute, cache=cache):
+            results.append(result)
+
+            print(json.dumps(result), flush=True)
+
+        if cache is not None:
+            cache.save()
+
+        if prometheus is not None:
+            write_prometheus(prometheus, results)
+
+        return 1 if any(result["status"] == "error" for result in results) else 0
+
+    @staticmethod
+    def serve(socket: Path, execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]):
+        # Stopping the server (as with Ctrl+C) removes its socket
+        signal.signal(signal.SIGTERM, lambda *_: exit(0))
+
+        with Server(socket.expanduser(), Registry(execute=execute, cache=cache, backups=backups)) as server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+    @staticmethod
+    def watch(config: BufferedReader, targets: Iterable[Path], execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]):
+        new_config = read_config(config)
+
+        try:
+            for result in watch(targets, new_config, execute=execute, cache=cache, backups=backups):
+                print(json.dumps(result), flush=True)
+        except KeyboardInterrupt:
+            pass
+
+    @staticmethod
+    def patch_archive(config: BufferedReader, archive: BufferedReader, output: Path, member: Optional[str], execute: bool,
+                      cache: Optional[Cache], backups: Optional[BackupStore]) -> int:
+        new_config = read_config(config)
+
+        # The results don't go where the archive goes
+        log = sys.stderr if str(output) == "-" else sys.stdout
+
+        # The archive is written next to the output and renamed over it once complete: a failure leaves nothing behind
+        temporary = None if str(output) == "-" else output.with_name(f".{output.name}.{os.getpid()}")
+
+        patched = 0
+
+        try:
+            # The standard output is written to, but never closed
+            output_file = open(temporary, "xb") if temporary is not None else contextlib.nullcontext(sys.stdout.buffer)
+
+            with archive as source, output_file as destination:
+                for result in patch_archive(source, destination, new_config, member=member):
+                    patched += 1
+
+                    print(json.dumps(result), file=log, flush=True)
+
+                destination.flush()
+
+            if not patched:
+                raise ValueError("No Ncdu binary was found in the archive.")
+
+            if temporary is not None:
+                os.replace(temporary, output)
+        finally:
+            if temporary is not None:
+                temporary.unlink(missing_ok=True)
+
+    @staticmethod
+    def backups_list(execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]):
+        for entry in backups or BackupStore():
+            print(json.dumps(entry), flush=True)
+
+    @staticmethod
+    def backups_restore(paths: list[Path], applied: bool, execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]) -> int:
+        store = backups or BackupStore()
+
+        failures = 0
+
+        # Restoring isn't backed up: the recorded tables are left as they are
+        for path in paths or [Path(entry["path"]) for entry in store]:
+            result = run_one(restore_target, path.expanduser().absolute(), store, applied=applied, execute=execute, cache=cache)
+
+            failures += result["status"] == "error"
+
+            print(json.dumps(result), flush=True)
+
+        return 1 if failures else 0
+
+    @staticmethod
+    def backups_gc(execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]):
+        entries, objects = (backups or BackupStore()).gc()
+
+        print(f"Deleted {entries} backups of binaries which don't exist anymore, and {objects} unused tables.")
+
+    @staticmethod
+    def cache_stats(execute: bool, cache: Optional[Cache], backups: Optional[BackupStore]):
+        store = ArtifactStore()
+
+        hits, misses, saved = store.stats["hits"], store.stats["misses"], store.stats["bytes_saved"]
+
+        print(f"Artifacts: {len(store.entries)} patched binaries ({store.size} bytes, at most {store.max_size}) in {str(store.path)!r}.")
+        print(f"Hits: {hits}, misses: {misses} (hit rate: {hits / (hits + misses) if hits + misses else 0:.1%}).")
+        print(f"Bytes saved (reflinked rather than patched): {saved}.")
+
 
 def get_parser():
     parser = argparse.ArgumentParser(prog="ncducolors", usage="%(prog)s [--ncdu PATH] <action> [...]", add_help=False)
     parser.add_argument("--help", "-h", action="store_true", default=argparse.SUPPRESS, help="Show this help message and exit")
     parser.add_argument("--ncdu", type=Path, default=shutil.which("ncdu"), help="Path of Ncdu binary")
+    parser.add_argument("--no-exec", dest="execute", action="store_false", help="Never run Ncdu to detect its version")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="Don't use the cache of versions and offsets")
+    parser.add_argument("--no-backup", dest="backup", action="store_false", help="Don't back up the theme tables before overwriting them")
+    parser.add_argument("--search-workers", type=int, default=1, help="Number of processes searching a (big) binary")
+    parser.add_argument("--max-memory", type=int, help="Maximum size (in MiB) of the binary kept in memory while searching it")
+    parser.add_argument("--timings", action="store_true", help="Print the duration and bytes read and written of every phase")
     parser.add_argument("--version", "-v", action="version", version=f"%(prog)s {__version__}")
 
     subparser = parser.add_subparsers(title="action")
@@ -161,15 +498,89 @@ def get_parser():
     extract_default_config.add_argument("config", type=argparse.FileType("wt"), default=sys.stdout, help="Path of config file (JSON) where to extract")
     extract_default_config.add_argument("--compact", action="store_true", help="Don't indent the JSON file")
 
+    compile_ = subparser.add_parser(name="compile", help="Compile a config to a binary patch, faster to apply")
+    compile_.set_defaults(handler=Handlers.compile, standalone=True)
+    compile_.add_argument("config", type=argparse.FileType("rt"), help="Path of config file (JSON) to compile")
+    compile_.add_argument("patch", type=argparse.FileType("wb"), help="Path of the compiled patch to write")
+
     apply_config = subparser.add_parser(name="apply-config", help="Apply an edited config")
-    apply_config.set_defaults(handler=Handlers.apply_config)
-    apply_config.add_argument("config", type=argparse.FileType("rt"), help="Path of config file (JSON) to apply")
+    apply_config.set_defaults(handler=Handlers.apply_config, batch_handler=Handlers.apply_config_batch)
+    apply_config.add_argument("config", type=argparse.FileType("rb"), help="Path of config file (JSON) or compiled patch to apply")
+    apply_config.add_argument("--fsync", action="store_true", help="Flush the changes to the disk before exiting")
+    apply_config.add_argument("--atomic", action="store_true", help="Patch a copy of the binary, then rename it over the original")
+    apply_config.add_argument("--targets", type=argparse.FileType("rt"), help="File listing the Ncdu binaries to patch ('-' for stdin)")
+    apply_config.add_argument("--workers", type=int, default=8, help="Number of binaries to patch concurrently")
+    apply_config.add_argument("--journal", type=Path, help="Path of the journal making the apply a transaction")
+    apply_config.add_argument("--artifacts", action="store_true", help="Reuse (and store) the patched binaries")
+
+    resume_ = subparser.add_parser(name="resume", help="Finish an interrupted transaction")
+    resume_.set_defaults(handler=Handlers.resume, standalone=True)
+    resume_.add_argument("journal", type=Path, help="Path of the journal of the transaction")
+    resume_.add_argument("--workers", type=int, default=8, help="Number of binaries to patch concurrently")
+
+    rollback_ = subparser.add_parser(name="rollback", help="Restore the binaries patched by a transaction")
+    rollback_.set_defaults(handler=Handlers.rollback, standalone=True)
+    rollback_.add_argument("journal", type=Path, help="Path of the journal of the transaction")
 
     revert = subparser.add_parser(name="revert", help="Revert Ncdu as it was before being patched")
     revert.set_defaults(handler=Handlers.revert)
-    revert_args = revert.add_mutually_exclusive_group(required=True)
+    revert_args = revert.add_mutually_exclusive_group(required=False)
     revert_args.add_argument("--config", type=argparse.FileType("rt"), help="Path of config file to load the offset from")
     revert_args.add_argument("--offset", type=int, help="Offset to Ncdu binary's colors config")
+    revert.add_argument("--fsync", action="store_true", help="Flush the changes to the disk before exiting")
+    revert.add_argument("--atomic", action="store_true", help="Patch a copy of the binary, then rename it over the original")
+
+    identify = subparser.add_parser(name="identify", help="Tell whether Ncdu is unpatched, patched with a known config or unknown")
+    identify.set_defaults(handler=Handlers.identify)
+    identify.add_argument("--config", type=argparse.FileType("rt"), action="append", help="Path of a config file (JSON) to recognise")
+
+    discover_ = subparser.add_parser(name="discover", help="Find every Ncdu binary under the given directories")
+    discover_.set_defaults(handler=Handlers.discover, standalone=True)
+    discover_.add_argument("roots", type=Path, nargs="+", metavar="ROOT", help="Directory to look into")
+    discover_.add_argument("--workers", type=int, default=8, help="Number of directories and binaries to process concurrently")
+
+    audit = subparser.add_parser(name="audit", help="Tell whether the given config is applied, without writing anything")
+    audit.set_defaults(handler=Handlers.audit, standalone=True)
+    audit.add_argument("--config", type=argparse.FileType("rb"), required=True, help="Path of the expected config file (JSON) or compiled patch")
+    audit.add_argument("--targets", type=argparse.FileType("rt"), help="File listing the Ncdu binaries to audit ('-' for stdin)")
+    audit.add_argument("--workers", type=int, default=8, help="Number of binaries to audit concurrently")
+    audit.add_argument("--prometheus", type=Path, help="Path of the Prometheus textfile to write")
+
+    serve = subparser.add_parser(name="serve", help="Answer requests on a Unix socket, keeping the binaries' state")
+    serve.set_defaults(handler=Handlers.serve, standalone=True)
+    serve.add_argument("--socket", type=Path, required=True, help="Path of the Unix socket to listen on")
+
+    watch_ = subparser.add_parser(name="watch", help="Apply a config again whenever Ncdu is replaced or rewritten")
+    watch_.set_defaults(handler=Handlers.watch, standalone=True)
+    watch_.add_argument("--config", type=argparse.FileType("rb"), required=True, help="Path of config file (JSON) or compiled patch to apply")
+    watch_.add_argument("--targets", type=argparse.FileType("rt"), help="File listing the Ncdu binaries to watch ('-' for stdin)")
+
+    patch_archive_ = subparser.add_parser(name="patch-archive", help="Apply a config to the Ncdu binaries inside a tar or .deb archive")
+    patch_archive_.set_defaults(handler=Handlers.patch_archive, standalone=True)
+    patch_archive_.add_argument("config", type=argparse.FileType("rb"), help="Path of config file (JSON) or compiled patch to apply")
+    patch_archive_.add_argument("archive", type=argparse.FileType("rb"), help="Path of the archive to patch ('-' for the standard input)")
+    patch_archive_.add_argument("output", type=Path, help="Path of the patched archive to write ('-' for the standard output)")
+    patch_archive_.add_argument("--member", help="Path (in the archive) of the Ncdu binary to patch")
+
+    backups = subparser.add_parser(name="backups", help="List, restore or delete the backups of the theme tables")
+    backups_subparser = backups.add_subparsers(title="command")
+
+    backups_list = backups_subparser.add_parser(name="list", help="List the backups")
+    backups_list.set_defaults(handler=Handlers.backups_list, standalone=True)
+
+    backups_restore = backups_subparser.add_parser(name="restore", help="Restore the original tables")
+    backups_restore.set_defaults(handler=Handlers.backups_restore, standalone=True)
+    backups_restore.add_argument("paths", type=Path, nargs="*", metavar="PATH", help="Ncdu binary to restore (default: all of them)")
+    backups_restore.add_argument("--applied", action="store_true", help="Restore the last applied table instead")
+
+    backups_gc = backups_subparser.add_parser(name="gc", help="Delete the backups of the binaries which don't exist anymore")
+    backups_gc.set_defaults(handler=Handlers.backups_gc, standalone=True)
+
+    cache_ = subparser.add_parser(name="cache", help="Tell how the artifact store is doing")
+    cache_subparser = cache_.add_subparsers(title="command")
+
+    cache_stats = cache_subparser.add_parser(name="stats", help="Print the size, hit rate and bytes saved of the artifact store")
+    cache_stats.set_defaults(handler=Handlers.cache_stats, standalone=True)
 
     return parser
 
@@ -178,28 +589,59 @@ def main():
     parser = get_parser()
     args = parser.parse_args()
 
-    try:
-        if args.ncdu is None:
-            raise ValueError("Ncdu was not found.")
+    timings = Timings() if args.timings else None
+
+    if timings is not None:
+        NcduColors.subscribe(timings)
 
+    try:
         if hasattr(args, "help") or not hasattr(args, "handler"):
             return print(HELP_MESSAGE)
 
-        if (handler := getattr(args, "handler", None)) is not None:
-            ncdu = NcduColors(ncdu=args.ncdu.expanduser())
+        # Batch mode: the binaries are listed in a file (or the apply is a transaction, even if of a single binary)
+        if hasattr(args, "batch_handler") and (args.targets is not None or args.journal is not None):
+            args.handler, args.standalone = args.batch_handler, True
+
+        if hasattr(args, "targets") and getattr(args, "standalone", False):
+            if args.targets is not None:
+                args.targets = read_targets(args.targets)
+            elif args.ncdu is None:
+                raise ValueError("Ncdu was not found.")
+            else:
+                # Batch-only actions work on the single Ncdu binary by default
+                args.targets = [args.ncdu.expanduser()]
+        elif hasattr(args, "batch_handler"):
+            del args.targets, args.workers, args.journal
+
+        handler = args.handler
+        cache = Cache() if args.cache else None
+        backups = BackupStore() if args.backup else None
+
+        # Standalone actions don't work on a single Ncdu binary
+        if getattr(args, "standalone", False):
+            kwargs = {"execute": args.execute, "cache": cache, "backups": backups}
+        elif args.ncdu is None:
+            raise ValueError("Ncdu was not found.")
+        else:
+            kwargs = {"ncdu": NcduColors(ncdu=args.ncdu.expanduser(), execute=args.execute, cache=cache, backups=backups,
+                                         workers=args.search_workers, memory=args.max_memory and args.max_memory << 20)}
 
-            delattr(args, "ncdu")
-            delattr(args, "handler")
+        for option in ("ncdu", "execute", "cache", "backup", "search_workers", "max_memory", "timings", "handler", "batch_handler",
+                       "standalone"):
+            if hasattr(args, option):
+                delattr(args, option)
 
-            handler(ncdu=ncdu, **args.__dict__)
-        else:
-            parser.print_help()
+        if status := handler(**kwargs, **args.__dict__):
+            exit(status)
     except Exception as exception:
         print(f"Error: {exception}", end="\n\n")
 
         parser.print_usage()
 
         exit(1)
+    finally:
+        if timings is not None:
+            print(json.dumps(timings.as_dict()), file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+import asyncio
+from asyncio.subprocess import PIPE
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import Callable, Final, Optional, TypeVar
+from weakref import WeakKeyDictionary
+
+from ncducolors.backup import BackupStore
+from ncducolors.batch import revert_target
+from ncducolors.cache import Cache
+from ncducolors.config import Config
+from ncducolors.ncducolors import NcduColors, VersionNotFoundError
+
+
+T = TypeVar("T")
+
+
+class AsyncNcduColors:
+    # Maximum number of binaries being read or written at the same time (per event loop), whatever the number of
+    # coroutines awaiting them
+    LIMIT: Final[int] = 16
+
+    _semaphores: "WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = WeakKeyDictionary()
+
+    def __init__(self, ncdu: NcduColors):
+        self.ncdu: NcduColors = ncdu
+
+        # The wrapped NcduColors is not meant to be used by two threads at once
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    @staticmethod
+    def _semaphore() -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+
+        if (semaphore := AsyncNcduColors._semaphores.get(loop)) is None:
+            semaphore = AsyncNcduColors._semaphores[loop] = asyncio.Semaphore(AsyncNcduColors.LIMIT)
+
+        return semaphore
+
+    @staticmethod
+    async def _offload(function: Callable[..., T], *args, **kwargs) -> T:
+        async with AsyncNcduColors._semaphore():
+            return await asyncio.to_thread(function, *args, **kwargs)
+
+    @staticmethod
+    async def _execute_version(ncdu: Path) -> str:
+        process = await asyncio.create_subprocess_exec(ncdu, "--version", stdout=PIPE, stderr=PIPE)
+
+        stdout, stderr = await process.communicate()
+
+        if process.returncode:
+            raise CalledProcessError(process.returncode, [ncdu, "--version"], stdout, stderr)
+
+        return NcduColors.parse_version_output(ncdu, stdout)
+
+    @staticmethod
+    async def create(ncdu: Path, execute: bool = True, cache: Optional[Cache] = None,
+                     backups: Optional[BackupStore] = None) -> "AsyncNcduColors":
+        try:
+            return AsyncNcduColors(await AsyncNcduColors._offload(NcduColors, ncdu=ncdu, execute=False, cache=cache, backups=backups))
+        except VersionNotFoundError:
+            if not execute:
+                raise
+
+        # The version is asked to Ncdu itself without blocking the event loop
+        version = await AsyncNcduColors._execute_version(ncdu.absolute())
+
+        return AsyncNcduColors(await AsyncNcduColors._offload(NcduColors, ncdu=ncdu, cache=cache, version=version, backups=backups))
+
+    async def __aenter__(self) -> "AsyncNcduColors":
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def close(self):
+        async with self._lock:
+            self.ncdu.close()
+
+    async def _run(self, function: Callable[..., T], *args, **kwargs) -> T:
+        async with self._lock:
+            return await AsyncNcduColors._offload(function, *args, **kwargs)
+
+    async def locate(self) -> int:
+        return await self._run(self.ncdu.locate)
+
+    async def extract_default_config(self) -> Config:
+        return await self._run(self.ncdu.extract_default_config)
+
+    async def apply_config(self, new_config: Config, fsync: bool = False, atomic: bool = False) -> int:
+        return await self._run(self.ncdu.apply_config, new_config, fsync=fsync, atomic=atomic)
+
+    async def revert(self, fsync: bool = False, atomic: bool = False) -> int:
+        return (await self._run(revert_target, self.ncdu, fsync=fsync, atomic=atomic))["bytes_written"]
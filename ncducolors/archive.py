@@ -0,0 +1,320 @@
+import bz2
+import contextlib
+import gzip
+import hashlib
+import io
+import lzma
+import os
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Final, Iterator, Optional, Union
+
+from ncducolors.batch import apply_target
+from ncducolors.config import Config
+from ncducolors.elf import Elf
+from ncducolors.ncducolors import NcduColors
+from ncducolors.patch import Patch
+
+
+BLOCK_SIZE: Final[int] = tarfile.BLOCKSIZE
+CHUNK_SIZE: Final[int] = 1024 * 1024
+
+AR_MAGIC: Final[bytes] = b"!<arch>\n"
+AR_HEADER_SIZE: Final[int] = 60
+
+GZIP_MAGIC: Final[bytes] = b"\x1f\x8b"
+XZ_MAGIC: Final[bytes] = b"\xfd7zXZ\x00"
+BZIP2_MAGIC: Final[bytes] = b"BZh"
+ZSTD_MAGIC: Final[bytes] = b"\x28\xb5\x2f\xfd"
+
+XZ_CHECKS: Final[dict[int, int]] = {0x00: lzma.CHECK_NONE, 0x01: lzma.CHECK_CRC32, 0x04: lzma.CHECK_CRC64, 0x0a: lzma.CHECK_SHA256}
+
+
+class Slice(io.RawIOBase):
+    # The next `size` bytes of a stream (an ar member), so that the decompressors can't read past them
+    def __init__(self, source: BinaryIO, size: int):
+        self.source: BinaryIO = source
+        self.remaining: int = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not (data := self.source.read(min(len(buffer), self.remaining))) and self.remaining:
+            raise ValueError("Truncated archive.")
+
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+
+        return len(data)
+
+
+def read_exactly(source: BinaryIO, size: int) -> bytes:
+    data = bytearray()
+
+    while len(data) < size:
+        if not (chunk := source.read(size - len(data))):
+            raise ValueError("Truncated archive.")
+
+        data += chunk
+
+    return bytes(data)
+
+
+def copy(source: BinaryIO, destination: BinaryIO, size: int):
+    while size:
+        chunk = read_exactly(source, min(size, CHUNK_SIZE))
+
+        destination.write(chunk)
+        size -= len(chunk)
+
+
+def padding(size: int, alignment: int) -> int:
+    return -size % alignment
+
+
+def is_ncdu(name: str, member: Optional[str]) -> bool:
+    if member is not None:
+        return name.removeprefix("./") == member.removeprefix("./")
+
+    return PurePosixPath(name).name == "ncdu"
+
+
+def pax_path(data: bytes) -> Optional[str]:
+    # Records are "<length> <key>=<value>\n", the length counting the whole record
+    path = None
+    position = 0
+
+    while position < len(data) and data[position:position + 1] != b"\0":
+        length = data[position:].split(b" ", 1)[0]
+        end = position + int(length)
+
+        key, _, value = data[position + len(length) + 1: end - 1].partition(b"=")
+
+        if key == b"path":
+            path = value.decode("utf-8", "surrogateescape")
+
+        position = end
+
+    return path
+
+
+def patch_member(source: BinaryIO, destination: BinaryIO, size: int, config: Union[Config, Patch], head: bytes = b"") -> dict:
+    # NcduColors works on a (mapped) file: the member is spooled to the disk, never held in memory whole
+    with tempfile.TemporaryDirectory(prefix="ncducolors-") as directory:
+        path = Path(directory) / "ncdu"
+
+        with open(path, "wb") as file:
+            file.write(head)
+            copy(source, file, size - len(head))
+
+        # The binary might not even run here (another architecture), and it isn't trusted anyway
+        target = NcduColors(ncdu=path, execute=False)
+
+        try:
+            result = apply_target(target, config)
+        finally:
+            target.close()
+
+        # Digested on the way out: packages list their files' digests (see patch_deb)
+        digest = hashlib.md5()
+
+        with open(path, "rb") as file:
+            while chunk := file.read(CHUNK_SIZE):
+                digest.update(chunk)
+                destination.write(chunk)
+
+    return result | {"md5": digest.hexdigest()}
+
+
+Rewrite = Callable[[str, BinaryIO, BinaryIO, int], Optional[dict]]
+
+
+def rewrite_tar(source: BinaryIO, destination: BinaryIO, rewrite: Rewrite) -> Iterator[dict]:
+    # The archive is copied block by block: headers (and so their checksums, which don't cover the data) are kept as-is,
+    # and only the regular files' data goes through `rewrite`, which must write exactly as many bytes as it reads
+    long_name = None
+
+    while block := source.read(BLOCK_SIZE):
+        block = block + read_exactly(source, BLOCK_SIZE - len(block)) if len(block) < BLOCK_SIZE else block
+
+        destination.write(block)
+
+        # The end of the archive: whatever follows (the second zero block, the record padding) is copied through
+        if block == bytes(BLOCK_SIZE):
+            return shutil.copyfileobj(source, destination, CHUNK_SIZE)
+
+        try:
+            info = tarfile.TarInfo.frombuf(block, encoding="utf-8", errors="surrogateescape")
+        except tarfile.HeaderError as exception:
+            raise ValueError(f"Malformed tar archive ({exception}).")
+
+        # Extended headers, describing the next member: only its name matters here
+        if info.type in (tarfile.GNUTYPE_LONGNAME, tarfile.GNUTYPE_LONGLINK, tarfile.XHDTYPE, tarfile.XGLTYPE, tarfile.SOLARIS_XHDTYPE):
+            data = read_exactly(source, info.size + padding(info.size, BLOCK_SIZE))
+            destination.write(data)
+
+            if info.type == tarfile.GNUTYPE_LONGNAME:
+                long_name = data[:info.size].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            elif info.type == tarfile.XHDTYPE:
+                long_name = pax_path(data[:info.size]) or long_name
+
+            continue
+
+        name, long_name = long_name or info.name, None
+
+        if info.type in (tarfile.REGTYPE, tarfile.AREGTYPE):
+            if (result := rewrite(name, source, destination, info.size)) is not None:
+                yield result
+
+            copy(source, destination, padding(info.size, BLOCK_SIZE))
+        elif info.type not in (tarfile.LNKTYPE, tarfile.SYMTYPE, tarfile.CHRTYPE, tarfile.BLKTYPE, tarfile.DIRTYPE, tarfile.FIFOTYPE):
+            copy(source, destination, info.size + padding(info.size, BLOCK_SIZE))
+
+
+def patch_tar(source: BinaryIO, destination: BinaryIO, config: Union[Config, Patch], member: Optional[str] = None) -> Iterator[dict]:
+    def rewrite(name: str, source: BinaryIO, destination: BinaryIO, size: int) -> Optional[dict]:
+        if not is_ncdu(name, member):
+            return copy(source, destination, size)
+
+        head = read_exactly(source, min(size, len(Elf.MAGIC)))
+
+        # Not every file named "ncdu" is the binary (e.g. a wrapper script): the others are copied through
+        if head != Elf.MAGIC:
+            destination.write(head)
+
+            return copy(source, destination, size - len(head))
+
+        return {"member": name} | patch_member(source, destination, size, config, head=head)
+
+    yield from rewrite_tar(source, destination, rewrite)
+
+
+def rewrite_md5sums(source: BinaryIO, destination: BinaryIO, digests: dict[str, str]) -> Iterator[dict]:
+    # A control archive's md5sums file: "<digest>  <path>" lines, the paths relative to the root (without "./")
+    def rewrite(name: str, source: BinaryIO, destination: BinaryIO, size: int) -> Optional[dict]:
+        if name.removeprefix("./") != "md5sums":
+            return copy(source, destination, size)
+
+        lines = read_exactly(source, size).split(b"\n")
+
+        for i, line in enumerate(lines):
+            digest, separator, path = line.partition(b"  ")
+
+            # A digest is replaced by one of the same length: the member's size (and so its header) doesn't change
+            if separator and len(digest) == 32 and (new := digests.get(path.decode("utf-8", "surrogateescape").removeprefix("./"))):
+                lines[i] = new.encode("ascii") + separator + path
+
+        destination.write(b"\n".join(lines))
+
+        return None
+
+    yield from rewrite_tar(source, destination, rewrite)
+
+
+def recompress(source: io.BufferedReader, destination: BinaryIO,
+               function: Callable[[BinaryIO, BinaryIO], Iterator[dict]]) -> Iterator[dict]:
+    head = source.peek(10)
+
+    # The archive is compressed again as it was (same format, and same options as far as they are known)
+    if head.startswith(GZIP_MAGIC):
+        level = {2: 9, 4: 1}.get(head[8], 6)
+
+        with gzip.GzipFile(fileobj=source, mode="rb") as reader, \
+                gzip.GzipFile(filename="", fileobj=destination, mode="wb", compresslevel=level, mtime=int.from_bytes(head[4:8], "little")) as writer:
+            yield from function(reader, writer)
+    elif head.startswith(XZ_MAGIC):
+        with lzma.LZMAFile(source, mode="rb") as reader, \
+                lzma.LZMAFile(destination, mode="wb", format=lzma.FORMAT_XZ, check=XZ_CHECKS.get(head[7], lzma.CHECK_CRC64)) as writer:
+            yield from function(reader, writer)
+    elif head.startswith(BZIP2_MAGIC):
+        with bz2.BZ2File(source, mode="rb") as reader, bz2.BZ2File(destination, mode="wb", compresslevel=int(chr(head[3]))) as writer:
+            yield from function(reader, writer)
+    elif head.startswith(ZSTD_MAGIC):
+        raise ValueError("Zstandard-compressed archives are not supported.")
+    else:
+        yield from function(source, destination)
+
+
+def patch_compressed_tar(source: io.BufferedReader, destination: BinaryIO, config: Union[Config, Patch],
+                         member: Optional[str] = None) -> Iterator[dict]:
+    yield from recompress(source, destination, lambda reader, writer: patch_tar(reader, writer, config, member))
+
+
+def write_member(destination: BinaryIO, header: bytes, spool: BinaryIO):
+    size = spool.seek(0, os.SEEK_END)
+    spool.seek(0)
+
+    # The header is kept as-is, unless the member's size has changed
+    destination.write(header if size == int(header[48:58]) else header[:48] + str(size).ljust(10).encode("ascii") + header[58:])
+    copy(spool, destination, size)
+    destination.write(b"\n" * padding(size, 2))
+
+
+def patch_deb(source: BinaryIO, destination: BinaryIO, config: Union[Config, Patch], member: Optional[str] = None) -> Iterator[dict]:
+    destination.write(read_exactly(source, len(AR_MAGIC)))
+
+    # control.tar comes before data.tar, but its md5sums must list the patched binaries' digests (or debsums and
+    # "dpkg --verify" would report them as modified): the members up to data.tar are spooled until it is patched
+    held: list[tuple[str, bytes, BinaryIO]] = []
+    digests: Optional[dict[str, str]] = None
+
+    with contextlib.ExitStack() as stack:
+        while header := source.read(AR_HEADER_SIZE):
+            header = header + read_exactly(source, AR_HEADER_SIZE - len(header)) if len(header) < AR_HEADER_SIZE else header
+
+            name, size = header[:16].decode("ascii").strip().rstrip("/"), int(header[48:58])
+
+            # After data.tar, the members are copied through
+            if digests is not None:
+                destination.write(header)
+                copy(source, destination, size + padding(size, 2))
+
+                continue
+
+            spool = stack.enter_context(tempfile.TemporaryFile())
+
+            if name.startswith("data.tar"):
+                digests = {}
+
+                for result in patch_compressed_tar(io.BufferedReader(Slice(source, size), CHUNK_SIZE), spool, config, member):
+                    digests[result["member"].removeprefix("./")] = result["md5"]
+
+                    yield result
+            else:
+                copy(source, spool, size)
+
+            read_exactly(source, padding(size, 2))
+            held.append((name, header, spool))
+
+            if digests is None:
+                continue
+
+            for held_name, held_header, held_spool in held:
+                if held_name.startswith("control.tar") and digests:
+                    held_spool.seek(0)
+
+                    # Only the control archive's md5sums file changes: there's nothing to report
+                    for _ in recompress(held_spool, rewritten := stack.enter_context(tempfile.TemporaryFile()),
+                                        lambda reader, writer: rewrite_md5sums(reader, writer, digests)):
+                        pass
+
+                    held_spool = rewritten
+
+                write_member(destination, held_header, held_spool)
+
+            held = []
+
+        # Without data.tar, nothing was patched
+        for _, held_header, held_spool in held:
+            write_member(destination, held_header, held_spool)
+
+
+def patch_archive(source: io.BufferedReader, destination: BinaryIO, config: Union[Config, Patch],
+                  member: Optional[str] = None) -> Iterator[dict]:
+    if source.peek(len(AR_MAGIC)).startswith(AR_MAGIC):
+        yield from patch_deb(source, destination, config, member)
+    else:
+        yield from patch_compressed_tar(source, destination, config, member)
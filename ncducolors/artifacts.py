@@ -0,0 +1,299 @@
+import fcntl
+import json
+import mmap
+import os
+import shutil
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Final, Optional, Union
+
+from ncducolors.cache import Cache
+from ncducolors.config import Config
+from ncducolors.ncducolors import NcduColors
+from ncducolors.patch import Patch
+
+
+class ArtifactStore:
+    FORMAT: Final[int] = 1
+    MAX_SIZE: Final[int] = 256 * 1024 * 1024
+
+    def __init__(self, path: Optional[Path] = None, max_size: int = MAX_SIZE, autosave: bool = True):
+        self.path: Path = path or ArtifactStore.default_path()
+        self.max_size: int = max_size
+        self.autosave: bool = autosave
+
+        self.entries, self.stats = self._load()
+
+        # This store's changes since the index was last read: only they are merged into the (maybe newer) index
+        self._stored: dict[str, dict] = {}
+        self._used: dict[str, float] = {}
+        self._removed: dict[str, int] = {}
+        self._counted: dict[str, int] = dict.fromkeys(self.stats, 0)
+
+        self._lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def default_path() -> Path:
+        # Patched binaries can always be built again: they belong to the cache
+        return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ncducolors" / "artifacts"
+
+    @staticmethod
+    def key(source: str, config: str) -> str:
+        return Cache.digest(f"{source}:{config}".encode("ascii"))
+
+    @staticmethod
+    def config_digest(config: Union[Config, Patch]) -> str:
+        # Neither the path nor the offset are part of it: a compiled config is the same whatever the binary
+        return Cache.digest((config if isinstance(config, Patch) else Patch.compile(config)).as_bytes())
+
+    @property
+    def index(self) -> Path:
+        return self.path / "index.json"
+
+    def _object(self, key: str) -> Path:
+        return self.path / "objects" / key[:2] / key[2:]
+
+    def _load(self) -> tuple[dict[str, dict], dict[str, int]]:
+        stats = {"hits": 0, "misses": 0, "bytes_saved": 0}
+
+        try:
+            content = json.loads(self.index.read_text())
+        except (OSError, ValueError):
+            return {}, stats
+
+        if not isinstance(content, dict) or content.get("format") != ArtifactStore.FORMAT:
+            return {}, stats
+
+        return content.get("entries", {}), stats | content.get("stats", {})
+
+    def _locked(self) -> int:
+        # Held while the index is read, merged and written: other processes' entries are never lost (their objects would
+        # never be evicted)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        fd = os.open(self.path / "index.lock", os.O_RDWR | os.O_CREAT, 0o600)
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+
+            raise
+
+        return fd
+
+    def _merge(self) -> str:
+        # The caller holds the index lock
+        entries, stats = self._load()
+
+        with self._lock:
+            # Unless stored again meanwhile (then, it's another object)
+            for key, mtime in self._removed.items():
+                if entries.get(key, {}).get("mtime") == mtime:
+                    del entries[key]
+
+            entries.update(self._stored)
+
+            for key, used in self._used.items():
+                if key in entries:
+                    entries[key]["used"] = max(entries[key].get("used", 0), used)
+
+            for name, count in self._counted.items():
+                stats[name] = stats.get(name, 0) + count
+
+            # Evicted once every process' entries are known, least recently used first
+            evicted = sorted(entries, key=lambda k: entries[k].get("used", 0))
+
+            while sum(entry["size"] for entry in entries.values()) > self.max_size and len(evicted) > 1:
+                del entries[evicted[0]]
+                self._object(evicted.pop(0)).unlink(missing_ok=True)
+
+            self._stored.clear()
+            self._used.clear()
+            self._removed.clear()
+            self._counted = dict.fromkeys(stats, 0)
+
+            self.entries, self.stats = entries, stats
+
+            return json.dumps({"format": ArtifactStore.FORMAT, "entries": entries, "stats": stats}, separators=(",", ":"))
+
+    def save(self):
+        if not self._stored and not self._used and not self._removed and not any(self._counted.values()):
+            return
+
+        fd = self._locked()
+
+        try:
+            content = self._merge()
+
+            temporary = self.index.with_name(f".{self.index.name}.{os.getpid()}.{threading.get_ident()}")
+            temporary.write_text(content)
+
+            os.replace(temporary, self.index)
+        finally:
+            os.close(fd)
+
+    def _count(self, name: str, count: int = 1):
+        # The caller holds the lock
+        self.stats[name] += count
+        self._counted[name] += count
+
+    @property
+    def size(self) -> int:
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            if (entry := self.entries.get(key)) is not None:
+                try:
+                    status = self._object(key).stat()
+                except OSError:
+                    status = None
+
+                # Tampered with (or truncated by a full disk): the object can't be trusted
+                if status is None or (status.st_size, status.st_mtime_ns) != (entry["size"], entry["mtime"]):
+                    del self.entries[key]
+                    self._stored.pop(key, None)
+                    self._removed[key] = entry["mtime"]
+
+                    self._object(key).unlink(missing_ok=True)
+
+                    entry = None
+
+            if entry is None:
+                self._count("misses")
+            else:
+                entry["used"] = self._used[key] = time.time()
+
+        return entry
+
+    @staticmethod
+    def _clone(source: Path, destination: Path, mode: int) -> bool:
+        with open(source, "rb") as reader:
+            fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+
+            try:
+                try:
+                    fcntl.ioctl(fd, NcduColors.FICLONE, reader.fileno())
+
+                    cloned = True
+                except OSError:
+                    with open(fd, "wb", closefd=False) as writer:
+                        shutil.copyfileobj(reader, writer, NcduColors.WINDOW)
+
+                    cloned = False
+
+                os.fchmod(fd, mode)
+                os.fsync(fd)
+            except BaseException:
+                destination.unlink(missing_ok=True)
+
+                raise
+            finally:
+                os.close(fd)
+
+        return cloned
+
+    def put(self, key: str, ncdu: Path, *, offset: int, length: int):
+        path = self._object(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        status = ncdu.stat()
+
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+
+        ArtifactStore._clone(ncdu, temporary, stat.S_IMODE(status.st_mode))
+
+        try:
+            os.chown(temporary, status.st_uid, status.st_gid)
+        except PermissionError:
+            pass
+
+        os.replace(temporary, path)
+
+        with self._lock:
+            self.entries[key] = self._stored[key] = {
+                "size": status.st_size,
+                "mtime": path.stat().st_mtime_ns,
+                "offset": offset,
+                "length": length,
+                "used": time.time()
+            }
+
+            self._removed.pop(key, None)
+
+        # The store's size is bounded when saving (see _merge)
+        if self.autosave:
+            self.save()
+
+    def read(self, key: str, offset: int, length: int) -> bytes:
+        with open(self._object(key), "rb") as file:
+            return os.pread(file.fileno(), length, offset)
+
+    def materialize(self, key: str, ncdu: Path, source: str, fsync: bool = False) -> Optional[str]:
+        path = self._object(key)
+
+        # Locked as NcduColors.write_table does: a concurrent apply-config either is done (then the binary isn't the
+        # source anymore) or waits for the rename (then patches the materialized binary)
+        fd = NcduColors.lock(ncdu, os.O_RDONLY)
+
+        try:
+            status = os.fstat(fd)
+
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as binary:
+                changed = Cache.digest(binary) != source
+
+            if changed:
+                return self._missed()
+
+            temporary = ncdu.with_name(f".{ncdu.name}.{os.getpid()}.{threading.get_ident()}")
+
+            # Never a hardlink: every binary materialized from the object would share its inode, and patching one of them
+            # in place (e.g. by a transaction) would patch all of them, and the object too
+            try:
+                method = "reflink" if ArtifactStore._clone(path, temporary, stat.S_IMODE(status.st_mode)) else "copy"
+            except FileNotFoundError:
+                # Evicted (by another process) since it was looked up
+                return self._missed()
+
+            try:
+                try:
+                    os.chown(temporary, status.st_uid, status.st_gid)
+                except PermissionError:
+                    pass
+
+                os.rename(temporary, ncdu)
+            except BaseException:
+                temporary.unlink(missing_ok=True)
+
+                raise
+        finally:
+            os.close(fd)
+
+        if fsync:
+            directory_fd = os.open(ncdu.parent, os.O_RDONLY)
+
+            try:
+                os.fsync(directory_fd)
+            finally:
+                os.close(directory_fd)
+
+        with self._lock:
+            self._count("hits")
+
+            # A copy saves the search and the encoding, but not the bytes
+            if method != "copy":
+                self._count("bytes_saved", status.st_size)
+
+        if self.autosave:
+            self.save()
+
+        return method
+
+    def _missed(self) -> None:
+        with self._lock:
+            self._count("misses")
+
+        return None
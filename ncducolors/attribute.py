@@ -1,5 +1,5 @@
 from enum import auto, Flag
-from functools import reduce
+from functools import cache, reduce
 from typing import Optional, Final
 
 from . import Endianness
@@ -28,12 +28,7 @@ class Attribute(Flag):
 
     @property
     def as_string(self) -> Optional[str]:
-        if self == Attribute.NONE:
-            return None
-
-        flags = {flag for flag in Attribute.__members__.values() if flag in self and flag is not Attribute.NONE}
-
-        return " + ".join(map(lambda flag: flag.name.capitalize(), flags))
+        return _as_string(self.value)
 
     def get_code(self, length: int = 4, byteorder: Endianness = "little", signed: bool = False) -> bytes:
         return self.value.to_bytes(length=length, byteorder=byteorder, signed=signed)
@@ -48,3 +43,15 @@ class Attribute(Flag):
     @staticmethod
     def from_code(value: bytes, byteorder: Endianness = "little", signed: bool = True) -> "Attribute":
         return Attribute(int.from_bytes(value, signed=signed, byteorder=byteorder))
+
+
+# Single flags, sorted by bit
+_FLAGS: Final[tuple[Attribute]] = tuple(flag for flag in Attribute.__members__.values() if flag is not Attribute.NONE)
+
+
+@cache
+def _as_string(value: int) -> Optional[str]:
+    if value == Attribute.NONE.value:
+        return None
+
+    return " + ".join(flag.name.capitalize() for flag in _FLAGS if flag.value & value)
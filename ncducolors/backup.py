@@ -0,0 +1,207 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Final, Iterator, Optional
+
+from ncducolors import Endianness
+from ncducolors.cache import Cache
+
+
+class BackupStore:
+    FORMAT: Final[int] = 1
+
+    # Unreferenced tables younger than this aren't collected: they might belong to backups not saved yet (e.g. by a
+    # batch still running in another process)
+    GC_GRACE: Final[float] = 24 * 60 * 60
+
+    def __init__(self, path: Optional[Path] = None, autosave: bool = True):
+        self.path: Path = path or BackupStore.default_path()
+        self.autosave: bool = autosave
+
+        self.entries: dict[str, dict] = self._load()
+
+        # This store's changes since the index was last read: only they are written over the (maybe newer) index
+        self._recorded: dict[str, dict] = {}
+        self._removed: set[str] = set()
+
+        self._lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def default_path() -> Path:
+        # Unlike the cache, backups can't be rebuilt: they are data
+        return Path(os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share") / "ncducolors" / "backups"
+
+    @property
+    def index(self) -> Path:
+        return self.path / "index.json"
+
+    def _object(self, digest: str) -> Path:
+        return self.path / "objects" / digest[:2] / digest[2:]
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            content = json.loads(self.index.read_text())
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(content, dict) or content.get("format") != BackupStore.FORMAT:
+            return {}
+
+        return content.get("entries", {})
+
+    @staticmethod
+    def _write_atomically(path: Path, content: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        temporary.write_bytes(content)
+
+        os.replace(temporary, path)
+
+    def _locked(self) -> int:
+        # Held while the index is read, merged and written: other processes' entries are never lost
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        fd = os.open(self.path / "index.lock", os.O_RDWR | os.O_CREAT, 0o600)
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+
+            raise
+
+        return fd
+
+    def _merge(self) -> str:
+        # The caller holds the index lock
+        entries = self._load()
+
+        with self._lock:
+            for path in self._removed:
+                entries.pop(path, None)
+
+            for path, entry in self._recorded.items():
+                other = entries.get(path)
+
+                # Another process patched the binary since it was loaded: the original table is the one it backed up
+                if other is not None and other.get("offset") == entry["offset"] and other.get("applied") == entry["original"]:
+                    entry["original"] = other["original"]
+
+                entries[path] = entry
+
+            self._recorded.clear()
+            self._removed.clear()
+
+            self.entries = entries
+
+            return json.dumps({"format": BackupStore.FORMAT, "entries": entries}, separators=(",", ":"))
+
+    def save(self):
+        if not self._recorded and not self._removed:
+            return
+
+        fd = self._locked()
+
+        try:
+            BackupStore._write_atomically(self.index, self._merge().encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def put_object(self, table: bytes) -> str:
+        digest = Cache.digest(table)
+
+        # Content-addressed: the same table (e.g. the defaults of a given version) is stored once for the whole fleet
+        if not (path := self._object(digest)).exists():
+            BackupStore._write_atomically(path, table)
+        else:
+            try:
+                # Used again: not collected before the grace period
+                os.utime(path)
+            except OSError:
+                pass
+
+        return digest
+
+    def get_object(self, digest: str) -> bytes:
+        table = self._object(digest).read_bytes()
+
+        if Cache.digest(table) != digest:
+            raise ValueError(f"The backup {digest} is corrupted.")
+
+        return table
+
+    def get(self, ncdu: Path) -> Optional[dict]:
+        return self.entries.get(str(ncdu))
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(list(self.entries.values()))
+
+    def record(self, ncdu: Path, *, version: tuple[int], byteorder: Endianness, darkbg: bool, offset: int, current: bytes, new: bytes):
+        previous = self.get(ncdu)
+
+        # The original table is the one found before the first patch: later patches (of the same, untouched binary)
+        # only update the applied one
+        if previous is not None and previous["offset"] == offset and previous["applied"] == Cache.digest(current):
+            original = previous["original"]
+        else:
+            original = self.put_object(current)
+
+        applied = self.put_object(new)
+
+        try:
+            fingerprint = Cache.fingerprint(ncdu)
+        except OSError:
+            fingerprint = None
+
+        with self._lock:
+            self.entries[str(ncdu)] = self._recorded[str(ncdu)] = {
+                "path": str(ncdu),
+                "fingerprint": fingerprint,
+                "version": list(version),
+                "byteorder": byteorder,
+                "darkbg": darkbg,
+                "offset": offset,
+                "length": len(new),
+                "original": original,
+                "applied": applied,
+                "time": time.time()
+            }
+
+        # Batches save once, at the end
+        if self.autosave:
+            self.save()
+
+    def gc(self) -> tuple[int, int]:
+        fd = self._locked()
+
+        try:
+            self._merge()
+
+            with self._lock:
+                removed = [path for path in self.entries if not Path(path).exists()]
+
+                self._removed.update(removed)
+
+            BackupStore._write_atomically(self.index, self._merge().encode("utf-8"))
+
+            referenced = {entry[kind] for entry in self.entries.values() for kind in ("original", "applied")}
+
+            deleted = 0
+            now = time.time()
+
+            for path in (self.path / "objects").glob("*/*"):
+                try:
+                    if path.parent.name + path.name not in referenced and now - path.stat().st_mtime > BackupStore.GC_GRACE:
+                        path.unlink()
+
+                        deleted += 1
+                except FileNotFoundError:
+                    pass
+        finally:
+            os.close(fd)
+
+        return len(removed), deleted
@@ -0,0 +1,216 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from io import TextIOWrapper
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+from ncducolors.artifacts import ArtifactStore
+from ncducolors.backup import BackupStore
+from ncducolors.cache import Cache
+from ncducolors.config import Config
+from ncducolors.ncducolors import NcduColors
+from ncducolors.patch import Patch
+from ncducolors.sequence import Sequence
+
+
+def read_targets(targets: TextIOWrapper) -> Iterator[Path]:
+    with targets as file:
+        for line in file:
+            if (line := line.strip()) and not line.startswith("#"):
+                yield Path(line).expanduser()
+
+
+def adapt(config: Config, target: NcduColors, offset: int) -> Config:
+    # The offset (as the path) is binary-dependent: each target locates its own table. Also, older targets don't have
+    # the darkbg theme at all, and a config without it keeps the target's current one (as apply_config does).
+    if not target.supports_darkbg:
+        darkbg = None
+    elif (darkbg := config.darkbg) is None:
+        darkbg = target.load_config(offset=offset).darkbg
+
+    return Config(ncdu=target.ncdu, offset=offset, off=config.off, dark=config.dark, darkbg=darkbg)
+
+
+def encode(config: Union[Config, Patch], target: NcduColors, offset: int) -> bytes:
+    if isinstance(config, Patch):
+        return config.table(themes=3 if target.supports_darkbg else 2, byteorder=target.byteorder,
+                            current=target.binary[offset: offset + target.table_length])
+
+    return adapt(config, target, offset).as_bytes(byteorder=target.byteorder)
+
+
+def apply_target(target: NcduColors, config: Union[Config, Patch], fsync: bool = False, atomic: bool = False,
+                 artifacts: Optional[ArtifactStore] = None) -> dict:
+    if artifacts is not None:
+        key = ArtifactStore.key(source=(source := Cache.digest(target.binary)), config=ArtifactStore.config_digest(config))
+
+        # The same binary was already patched with the same config (maybe elsewhere): no search, no encoding, no write
+        if (entry := artifacts.get(key)) is not None:
+            if target.backups is not None:
+                offset, length = entry["offset"], entry["length"]
+
+                target.backups.record(target.ncdu, version=target.version, byteorder=target.byteorder, darkbg=target.supports_darkbg,
+                                      offset=offset, current=target.binary[offset: offset + length], new=artifacts.read(key, offset, length))
+
+            # Unless the binary has just been patched (or the object evicted) by another process: then, it is patched here
+            if (method := artifacts.materialize(key, target.ncdu, source=source, fsync=fsync)) is not None:
+                return {"status": "changed", "bytes_written": 0, "artifact": method}
+
+            # The key is the one of the binary before the other process patched it: the result isn't stored
+            artifacts = None
+
+    if isinstance(config, Patch):
+        written = target.apply_patch(config, fsync=fsync, atomic=atomic)
+    else:
+        written = target.apply_config(adapt(config, target, target.locate()), fsync=fsync, atomic=atomic)
+
+    result = {"status": "changed" if written else "unchanged", "bytes_written": written}
+
+    if artifacts is not None and written:
+        artifacts.put(key, target.ncdu, offset=target.locate(), length=target.table_length)
+
+        result["artifact"] = "stored"
+
+    return result
+
+
+def revert_target(target: NcduColors, fsync: bool = False, atomic: bool = False) -> dict:
+    offset = target.locate()
+
+    default = NcduColors.dump_internal_default_config(ncdu=target.ncdu, offset=offset, with_darkbg=target.supports_darkbg,
+                                                      byteorder=target.byteorder)
+
+    written = target.apply_config(default, fsync=fsync, atomic=atomic)
+
+    return {"status": "changed" if written else "unchanged", "bytes_written": written}
+
+
+def restore_target(target: NcduColors, store: BackupStore, applied: bool = False) -> dict:
+    if (entry := store.get(target.ncdu)) is None:
+        raise ValueError("No backup of this binary was found.")
+
+    if entry["byteorder"] != target.byteorder or entry["length"] != target.table_length:
+        raise ValueError(f"The backup (Ncdu {'.'.join(map(str, entry['version']))}) doesn't fit this binary "
+                         f"(Ncdu {'.'.join(map(str, target.version))}).")
+
+    table = store.get_object(entry["applied" if applied else "original"])
+
+    # The recorded offset is trusted as long as the table there is one of the recorded ones: otherwise (e.g. after an
+    # upgrade), the table is looked for again
+    offset = entry["offset"]
+
+    if Cache.digest(target.binary[offset: offset + entry["length"]]) not in (entry["original"], entry["applied"]):
+        offset = target.locate()
+
+    written = target.write_table(offset=offset, new_bytes=table)
+
+    return {"status": "changed" if written else "unchanged", "bytes_written": written}
+
+
+def audit_target(target: NcduColors, config: Union[Config, Patch]) -> dict:
+    offset = target.locate()
+
+    current = target.binary[offset: offset + target.table_length]
+    expected = encode(config, target, offset)
+    default = Sequence.get_default(with_darkbg=target.supports_darkbg, byteorder=target.byteorder)
+
+    return {
+        "status": "ok" if current == expected else "drift",
+        "version": ".".join(map(str, target.version)),
+        "patched": current != default,
+        "offset": offset
+    }
+
+
+def run_one(function: Callable[..., dict], ncdu: Path, *args, execute: bool = True, cache: Optional[Cache] = None,
+            backups: Optional[BackupStore] = None, **kwargs) -> dict:
+    start = time.perf_counter()
+
+    try:
+        with NcduColors(ncdu=ncdu, execute=execute, cache=cache, backups=backups) as target:
+            result = {"path": str(ncdu)} | function(target, *args, **kwargs)
+    except Exception as exception:
+        result = {"path": str(ncdu), "status": "error", "error": str(exception) or type(exception).__name__}
+
+    result["seconds"] = round(time.perf_counter() - start, 6)
+
+    return result
+
+
+def apply_one(ncdu: Path, config: Union[Config, Patch], *, execute: bool = True, cache: Optional[Cache] = None, backups: Optional[BackupStore] = None,
+              fsync: bool = False, atomic: bool = False, artifacts: Optional[ArtifactStore] = None) -> dict:
+    return run_one(apply_target, ncdu, config, execute=execute, cache=cache, backups=backups, fsync=fsync, atomic=atomic, artifacts=artifacts)
+
+
+def audit_one(ncdu: Path, config: Union[Config, Patch], *, execute: bool = True, cache: Optional[Cache] = None) -> dict:
+    # The binary is mapped, never read: only the pages of the ELF headers and of the table are actually loaded (plus
+    # .rodata and the symbol table, if the cache misses)
+    return run_one(audit_target, ncdu, config, execute=execute, cache=cache)
+
+
+def run_many(function: Callable[..., dict], targets: Iterable[Path], *, workers: int, **kwargs) -> Iterator[dict]:
+    pending: set[Future] = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for ncdu in targets:
+            # Bounded number of queued targets: the list might be long (or endless, on stdin)
+            if len(pending) >= 4 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                yield from (future.result() for future in done)
+
+            pending.add(executor.submit(function, ncdu, **kwargs))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            yield from (future.result() for future in done)
+
+
+def apply_many(targets: Iterable[Path], config: Union[Config, Patch], *, workers: int, execute: bool = True, cache: Optional[Cache] = None,
+               backups: Optional[BackupStore] = None, fsync: bool = False, atomic: bool = False,
+               artifacts: Optional[ArtifactStore] = None) -> Iterator[dict]:
+    return run_many(apply_one, targets, workers=workers, config=config, execute=execute, cache=cache, backups=backups, fsync=fsync,
+                    atomic=atomic, artifacts=artifacts)
+
+
+def audit_many(targets: Iterable[Path], config: Union[Config, Patch], *, workers: int, execute: bool = True, cache: Optional[Cache] = None) -> Iterator[dict]:
+    return run_many(audit_one, targets, workers=workers, config=config, execute=execute, cache=cache)
+
+
+def prometheus_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def write_prometheus(path: Path, results: list[dict]):
+    metrics = {
+        "ncdu_theme_drift": ("Whether the theme table differs from the expected one.", lambda result: int(result["status"] == "drift")),
+        "ncdu_theme_patched": ("Whether the theme table differs from Ncdu's default one.", lambda result: int(result["patched"])),
+        "ncdu_version_info": ("Version of the Ncdu binary.", lambda result: 1),
+    }
+
+    lines = []
+
+    for name, (description, value) in metrics.items():
+        lines += f"# HELP {name} {description}", f"# TYPE {name} gauge"
+
+        for result in results:
+            if result["status"] == "error":
+                continue
+
+            labels = f'path="{prometheus_label(result["path"])}"'
+
+            if name == "ncdu_version_info":
+                labels += f',version="{result["version"]}"'
+
+            lines.append(f"{name}{{{labels}}} {value(result)}")
+
+    lines += "# HELP ncdu_theme_audit_error Whether the binary could not be audited.", "# TYPE ncdu_theme_audit_error gauge"
+    lines += (f'ncdu_theme_audit_error{{path="{prometheus_label(result["path"])}"}} {int(result["status"] == "error")}' for result in results)
+
+    # The textfile collector might read the file at any time: it must never see it half-written
+    temporary = path.with_name(f".{path.name}.{os.getpid()}")
+    temporary.write_text("\n".join(lines) + "\n")
+
+    os.replace(temporary, path)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Final, Optional
+
+from ncducolors import Buffer, Endianness
+
+
+class Cache:
+    FORMAT: Final[int] = 1
+    MAX_ENTRIES: Final[int] = 1024
+
+    def __init__(self, path: Optional[Path] = None, autosave: bool = True):
+        self.path: Path = path or Cache.default_path()
+        self.autosave: bool = autosave
+
+        self.entries: dict[str, dict] = self._load()
+
+        # The fingerprint of each path's entry: an older version of a binary is evicted without going through every entry
+        self._fingerprints: dict[str, str] = {entry.get("path"): fingerprint for fingerprint, entry in self.entries.items()}
+
+        self._lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def default_path() -> Path:
+        return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ncducolors" / "binaries.json"
+
+    @staticmethod
+    def fingerprint(ncdu: Path) -> str:
+        stat = ncdu.stat()
+
+        return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    @staticmethod
+    def digest(table: bytes) -> str:
+        return hashlib.blake2b(table, digest_size=16).hexdigest()
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            content = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(content, dict) or content.get("format") != Cache.FORMAT:
+            return {}
+
+        return content.get("entries", {})
+
+    def _prune(self):
+        # Entries of binaries which don't exist anymore: a stat each, so only when saving a batch or when the cache is full
+        for fingerprint, entry in list(self.entries.items()):
+            if not isinstance(entry.get("path"), str) or not Path(entry["path"]).exists():
+                del self.entries[fingerprint]
+
+                if self._fingerprints.get(entry.get("path")) == fingerprint:
+                    del self._fingerprints[entry["path"]]
+
+    def save(self, prune: bool = True):
+        with self._lock:
+            if prune:
+                self._prune()
+
+            content = json.dumps({"format": Cache.FORMAT, "entries": self.entries}, separators=(",", ":"))
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            temporary = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}")
+            temporary.write_text(content)
+
+            os.replace(temporary, self.path)
+        except OSError:
+            pass
+
+    def get(self, ncdu: Path, binary: Buffer, byteorder: Endianness) -> Optional[dict]:
+        try:
+            entry = self.entries.get(Cache.fingerprint(ncdu))
+        except OSError:
+            return None
+
+        if entry is None:
+            return None
+
+        try:
+            if entry["path"] != str(ncdu) or entry["byteorder"] != byteorder:
+                return None
+
+            # The file might have been rewritten keeping the same size and mtime: the table must be where it was
+            if Cache.digest(binary[entry["offset"]: entry["offset"] + entry["length"]]) != entry["digest"]:
+                return None
+        except (KeyError, TypeError):
+            return None
+
+        return entry
+
+    def put(self, ncdu: Path, binary: Buffer, *, version: tuple[int], byteorder: Endianness, darkbg: bool, offset: int, length: int):
+        try:
+            fingerprint = Cache.fingerprint(ncdu)
+        except OSError:
+            return
+
+        entry = {
+            "path": str(ncdu),
+            "version": list(version),
+            "byteorder": byteorder,
+            "darkbg": darkbg,
+            "offset": offset,
+            "length": length,
+            "digest": Cache.digest(binary[offset: offset + length]),
+            "time": time.time()
+        }
+
+        with self._lock:
+            # Evict the entry of an older version of the same binary
+            if (previous := self._fingerprints.get(str(ncdu))) not in (None, fingerprint):
+                self.entries.pop(previous, None)
+
+            self.entries[fingerprint] = entry
+            self._fingerprints[str(ncdu)] = fingerprint
+
+            if len(self.entries) > Cache.MAX_ENTRIES:
+                self._prune()
+
+                oldest = sorted(self.entries, key=lambda k: self.entries[k]["time"])
+
+                for evicted in oldest[:len(self.entries) - Cache.MAX_ENTRIES]:
+                    self._fingerprints.pop(self.entries.pop(evicted)["path"], None)
+
+        # Saved after each put, without pruning: put stays O(1), whatever the number of cached binaries
+        if self.autosave:
+            self.save(prune=False)
@@ -0,0 +1,42 @@
+import struct
+from functools import cache
+
+from ncducolors import Buffer, Endianness
+from ncducolors.key import Key
+from ncducolors.theme import Theme
+
+
+class Codec:
+    @staticmethod
+    @cache
+    def get_struct(*, themes: int, byteorder: Endianness = "little") -> struct.Struct:
+        key_format = Key.get_format(byteorder=byteorder)
+
+        # The table is a C array of {fg, bg, attributes} structs: keys major, themes minor
+        return struct.Struct(key_format[0] + key_format[1:] * (len(Theme.KEYS) * themes))
+
+    @staticmethod
+    def decode(binary: Buffer, *, offset: int = 0, themes: int, byteorder: Endianness = "little") -> tuple[int]:
+        table_struct = Codec.get_struct(themes=themes, byteorder=byteorder)
+
+        if offset < 0 or offset + table_struct.size > len(binary):
+            raise ValueError(f"The config at offset {offset} is truncated (expected {table_struct.size} bytes).")
+
+        return table_struct.unpack_from(binary, offset)
+
+    @staticmethod
+    def encode(values: tuple[int], *, themes: int, byteorder: Endianness = "little") -> bytes:
+        return Codec.get_struct(themes=themes, byteorder=byteorder).pack(*values)
+
+    @staticmethod
+    def encode_into(buffer: Buffer, values: tuple[int], *, offset: int = 0, themes: int, byteorder: Endianness = "little"):
+        Codec.get_struct(themes=themes, byteorder=byteorder).pack_into(buffer, offset, *values)
+
+    @staticmethod
+    def swap(table: Buffer, *, themes: int, byteorder: Endianness) -> bytes:
+        # The same table in the other byte order (e.g. to patch a big-endian binary with a table extracted from a little-endian one)
+        return Codec.encode(
+            Codec.decode(table, themes=themes, byteorder=byteorder),
+            themes=themes,
+            byteorder="big" if byteorder == "little" else "little"
+        )
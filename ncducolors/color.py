@@ -1,5 +1,5 @@
 from enum import Enum, auto
-from typing import Optional
+from typing import Final, Optional
 
 from . import Endianness
 
@@ -287,7 +287,7 @@ class Color(Enum):
 
     @property
     def as_string(self) -> Optional[str]:
-        return self.name.capitalize() if self is not Color.NONE else None
+        return _AS_STRING[self]
 
     def get_code(self, length: int = 2, byteorder: Endianness = "little", signed: bool = True) -> bytes:
         return self.value.to_bytes(length=length, byteorder=byteorder, signed=signed)
@@ -302,8 +302,9 @@ class Color(Enum):
 
     @classmethod
     def by_value(cls, value: int):
-        for member in cls:
-            if member.value == value:
-                return member
+        return _BY_VALUE.get(value, Color.UNKNOWN)
 
-        return Color.UNKNOWN
+
+# Decoding tables, built once: the first name of each value is the canonical one (e.g. BLACK, not COLOR0)
+_BY_VALUE: Final[dict[int, Color]] = {member.value: member for member in Color}
+_AS_STRING: Final[dict[Color, Optional[str]]] = {member: member.name.capitalize() if member is not Color.NONE else None for member in Color}
@@ -4,6 +4,7 @@ from pathlib import Path
 from typing import Optional
 from shutil import which
 
+from ncducolors.codec import Codec
 from ncducolors.theme import Theme
 from ncducolors import Endianness
 
@@ -49,10 +50,12 @@ class Config:
         else:
             themes = self.off, self.dark, self.darkbg
 
-        bytes_block = b""
+        values = []
 
         for str_key in Theme.KEYS:
             for theme in themes:
-                bytes_block += getattr(theme, str_key).as_bytes(byteorder=byteorder)
+                key = getattr(theme, str_key)
 
-        return bytes_block
+                values += key.fg.value, key.bg.value, key.a.value
+
+        return Codec.encode(values, themes=len(themes), byteorder=byteorder)
@@ -0,0 +1,101 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Final, Iterable, Iterator, Optional
+
+from ncducolors.cache import Cache
+from ncducolors.ncducolors import NcduColors
+from ncducolors.sequence import Sequence
+
+
+ELF_MAGIC: Final[bytes] = b"\x7fELF"
+
+
+def is_elf(path: str) -> bool:
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    except OSError:
+        return False
+
+    try:
+        return os.read(fd, len(ELF_MAGIC)) == ELF_MAGIC
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def scan_directory(directory: str) -> tuple[list[str], list[str]]:
+    directories, binaries = [], []
+
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    # Symbolic links are never followed: they would lead to loops and to binaries found twice
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mode & 0o111 and is_elf(entry.path):
+                        binaries.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+
+    return directories, binaries
+
+
+def classify(ncdu: Path, cache: Optional[Cache] = None) -> Optional[dict]:
+    try:
+        # Found binaries are never executed: the version must be found statically
+        target = NcduColors(ncdu=ncdu, execute=False, cache=cache)
+    except (OSError, ValueError):
+        # Not Ncdu (or an unsupported version of it)
+        return None
+
+    with target:
+        result = {"path": str(target.ncdu), "version": ".".join(map(str, target.version)), "byteorder": target.byteorder}
+
+        try:
+            offset = target.locate()
+        except ValueError as exception:
+            return result | {"darkbg": target.supports_darkbg, "state": "unknown", "error": str(exception)}
+
+        # Locating the table might have told whether it has the darkbg theme
+        default = Sequence.get_default(with_darkbg=target.supports_darkbg, byteorder=target.byteorder)
+
+        state = "unpatched" if target.binary[offset: offset + len(default)] == default else "patched"
+
+        return result | {"darkbg": target.supports_darkbg, "state": state, "offset": offset}
+
+
+def discover(roots: Iterable[Path], *, workers: int, cache: Optional[Cache] = None) -> Iterator[dict]:
+    # Directories still to be scanned are kept in a stack: walking depth-first, it only grows with the tree's depth
+    # (times the directories' width), never with the total number of files
+    directories: list[str] = []
+    pending: set[Future] = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for root in roots:
+            if root.is_dir():
+                directories.append(str(root))
+            else:
+                pending.add(executor.submit(classify, root, cache))
+
+        directories.reverse()
+
+        while directories or pending:
+            while directories and len(pending) < 4 * workers:
+                pending.add(executor.submit(scan_directory, directories.pop()))
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if isinstance(result := future.result(), tuple):
+                    subdirectories, binaries = result
+
+                    directories.extend(reversed(subdirectories))
+
+                    pending.update(executor.submit(classify, Path(binary), cache) for binary in binaries)
+                elif result is not None:
+                    yield result
@@ -0,0 +1,192 @@
+import struct
+from typing import Final, NamedTuple, Optional
+
+from . import Buffer, Endianness
+
+
+# See https://man7.org/linux/man-pages/man5/elf.5.html
+
+
+class Section(NamedTuple):
+    name: str
+    type: int
+    flags: int
+    address: int
+    offset: int
+    size: int
+    link: int
+    entsize: int
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+
+class Segment(NamedTuple):
+    type: int
+    offset: int
+    address: int
+    filesz: int
+    memsz: int
+
+
+class Symbol(NamedTuple):
+    name: str
+    address: int
+    size: int
+
+
+class Elf:
+    MAGIC: Final[bytes] = b"\x7fELF"
+
+    SHT_PROGBITS: Final[int] = 1
+    SHT_SYMTAB: Final[int] = 2
+    SHT_NOBITS: Final[int] = 8
+    SHT_DYNSYM: Final[int] = 11
+
+    SHN_XINDEX: Final[int] = 0xffff
+
+    PT_LOAD: Final[int] = 1
+
+    # Initialized data: the only sections where Ncdu's (static const) theme table and strings can be stored
+    DATA_SECTIONS: Final[tuple[str]] = ".rodata", ".data"
+
+    _HEADER: Final[dict[int, str]] = {1: "HHIIIIIHHHHHH", 2: "HHIQQQIHHHHHH"}
+    _SECTION: Final[dict[int, str]] = {1: "IIIIIIIIII", 2: "IIQQQQIIQQ"}
+    _SEGMENT: Final[dict[int, str]] = {1: "IIIIIIII", 2: "IIQQQQQQ"}
+    _SYMBOL: Final[dict[int, str]] = {1: "IIIBBH", 2: "IBBHQQ"}
+
+    def __init__(self, binary: Buffer):
+        if len(binary) < 64 or binary[:4] != Elf.MAGIC or binary[4] not in (1, 2) or binary[5] not in (1, 2):
+            raise ValueError("Malformed ELF file.")
+
+        self.binary: Buffer = binary
+
+        self.bits: int = 32 if binary[4] == 1 else 64
+        self.byteorder: Endianness = "little" if binary[5] == 1 else "big"
+
+        self._prefix: str = "<" if self.byteorder == "little" else ">"
+
+        (_, self.machine, _, _, phoff, shoff, _, _, phentsize, phnum, shentsize, shnum, shstrndx) = \
+            self._unpack(Elf._HEADER, 16)
+
+        self.segments: tuple[Segment] = self._load_segments(phoff, phentsize, phnum)
+        self.sections: tuple[Section] = self._load_sections(shoff, shentsize, shnum, shstrndx)
+
+    def _unpack(self, formats: dict[int, str], offset: int) -> tuple[int]:
+        fmt = self._prefix + formats[self.bits // 32]
+
+        if offset < 0 or offset + struct.calcsize(fmt) > len(self.binary):
+            raise ValueError("Malformed ELF file.")
+
+        return struct.unpack_from(fmt, self.binary, offset)
+
+    def _load_segments(self, phoff: int, phentsize: int, phnum: int) -> tuple[Segment]:
+        segments = []
+
+        for i in range(phnum if phoff else 0):
+            if self.bits == 32:
+                p_type, p_offset, p_vaddr, _, p_filesz, p_memsz, _, _ = self._unpack(Elf._SEGMENT, phoff + i * phentsize)
+            else:
+                p_type, _, p_offset, p_vaddr, _, p_filesz, p_memsz, _ = self._unpack(Elf._SEGMENT, phoff + i * phentsize)
+
+            segments.append(Segment(type=p_type, offset=p_offset, address=p_vaddr, filesz=p_filesz, memsz=p_memsz))
+
+        return tuple(segments)
+
+    def _load_sections(self, shoff: int, shentsize: int, shnum: int, shstrndx: int) -> tuple[Section]:
+        if not shoff:
+            return ()
+
+        # Extended numbering: the real values are stored in the first (null) section header
+        _, _, _, _, _, first_size, first_link, *_ = self._unpack(Elf._SECTION, shoff)
+
+        if shnum == 0:
+            shnum = first_size
+
+        if shstrndx == Elf.SHN_XINDEX:
+            shstrndx = first_link
+
+        headers = [self._unpack(Elf._SECTION, shoff + i * shentsize) for i in range(shnum)]
+
+        if not 0 < shstrndx < len(headers):
+            raise ValueError("Malformed ELF file.")
+
+        names_offset = headers[shstrndx][4]
+
+        return tuple(
+            Section(
+                name=self._string(names_offset + sh_name),
+                type=sh_type,
+                flags=sh_flags,
+                address=sh_addr,
+                offset=sh_offset,
+                size=sh_size if sh_type != Elf.SHT_NOBITS else 0,
+                link=sh_link,
+                entsize=sh_entsize
+            )
+            for sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link, _, _, sh_entsize in headers
+        )
+
+    def _string(self, offset: int) -> str:
+        end = self.binary.find(b"\0", offset) if offset < len(self.binary) else -1
+
+        if end == -1:
+            raise ValueError("Malformed ELF file.")
+
+        return bytes(self.binary[offset:end]).decode("ascii", errors="replace")
+
+    def sections_named(self, *names: str) -> tuple[Section]:
+        return tuple(
+            section for section in self.sections
+            if section.type == Elf.SHT_PROGBITS and section.size > 0 and section.end <= len(self.binary)
+            and any(section.name == name or section.name.startswith(f"{name}.") for name in names)
+        )
+
+    def data_sections(self) -> tuple[Section]:
+        return self.sections_named(*Elf.DATA_SECTIONS)
+
+    def section_at(self, offset: int) -> Optional[Section]:
+        for section in self.sections:
+            if section.type != Elf.SHT_NOBITS and section.offset <= offset < section.end:
+                return section
+
+        return None
+
+    def find_symbol(self, name: str) -> Optional[Symbol]:
+        encoded_name = name.encode("ascii") + b"\0"
+
+        fmt = self._prefix + Elf._SYMBOL[self.bits // 32]
+        entsize = struct.calcsize(fmt)
+
+        # .symtab (unstripped builds only) is a superset of .dynsym: search it first
+        for section in sorted(self.sections, key=lambda s: s.type != Elf.SHT_SYMTAB):
+            if section.type not in (Elf.SHT_SYMTAB, Elf.SHT_DYNSYM) or section.end > len(self.binary):
+                continue
+
+            if not 0 <= section.link < len(self.sections):
+                raise ValueError("Malformed ELF file.")
+
+            names_offset = self.sections[section.link].offset
+            length = section.size - section.size % entsize
+
+            with memoryview(self.binary)[section.offset: section.offset + length] as symbols:
+                for entry in struct.iter_unpack(fmt, symbols):
+                    if self.bits == 32:
+                        st_name, st_value, st_size, *_ = entry
+                    else:
+                        st_name, _, _, _, st_value, st_size = entry
+
+                    start = names_offset + st_name
+
+                    if st_name and self.binary[start: start + len(encoded_name)] == encoded_name:
+                        return Symbol(name=name, address=st_value, size=st_size)
+
+        return None
+
+    def address_to_offset(self, address: int) -> Optional[int]:
+        for segment in self.segments:
+            if segment.type == Elf.PT_LOAD and segment.address <= address < segment.address + segment.filesz:
+                return address - segment.address + segment.offset
+
+        return None
@@ -0,0 +1,87 @@
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class Phase(NamedTuple):
+    name: str
+    seconds: float
+    bytes_read: int
+    bytes_written: int
+    ncdu: Optional[Path]
+
+
+Hook = Callable[[Phase], None]
+
+HOOKS: list[Hook] = []
+
+
+class Counters(threading.local):
+    # Bytes read (searched, decoded, parsed) and written by the current thread, whether hooks are subscribed or not:
+    # incrementing them costs less than testing it
+    read: int = 0
+    written: int = 0
+
+
+counters = Counters()
+
+
+def subscribe(hook: Hook):
+    HOOKS.append(hook)
+
+
+def unsubscribe(hook: Hook):
+    HOOKS.remove(hook)
+
+
+def traced(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    # Only leaf operations are traced (e.g. the search, not the locate calling it), so that phases never overlap
+    def decorator(function: Callable[..., T]) -> Callable[..., T]:
+        @wraps(function)
+        def wrapper(*args, **kwargs) -> T:
+            if not HOOKS:
+                return function(*args, **kwargs)
+
+            read, written = counters.read, counters.written
+            start = time.perf_counter()
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                phase = Phase(name=name, seconds=time.perf_counter() - start, bytes_read=counters.read - read,
+                              bytes_written=counters.written - written, ncdu=getattr(args[0], "ncdu", None) if args else None)
+
+                for hook in tuple(HOOKS):
+                    hook(phase)
+
+        return wrapper
+
+    return decorator
+
+
+class Timings:
+    def __init__(self):
+        self.start: float = time.perf_counter()
+        self.phases: dict[str, dict] = {}
+
+        self._lock: threading.Lock = threading.Lock()
+
+    def __call__(self, phase: Phase):
+        with self._lock:
+            totals = self.phases.setdefault(phase.name, {"calls": 0, "seconds": 0.0, "bytes_read": 0, "bytes_written": 0})
+
+            totals["calls"] += 1
+            totals["seconds"] += phase.seconds
+            totals["bytes_read"] += phase.bytes_read
+            totals["bytes_written"] += phase.bytes_written
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            phases = {name: totals | {"seconds": round(totals["seconds"], 6)} for name, totals in self.phases.items()}
+
+        return {"seconds": round(time.perf_counter() - self.start, 6), "phases": phases}
@@ -0,0 +1,249 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from typing import Final, Iterable, Iterator, Optional, Union
+
+from ncducolors.backup import BackupStore
+from ncducolors.batch import encode, run_many, run_one
+from ncducolors.cache import Cache
+from ncducolors.config import Config
+from ncducolors.hooks import counters, traced
+from ncducolors.ncducolors import NcduColors
+from ncducolors.patch import Patch
+
+
+class Journal:
+    # Records (one JSON object per line): "begin", one "patch" per binary to be patched, "planned" (once every patch is
+    # synced to the disk, and before any binary is written), one "done" per binary patched, and finally "commit" (or
+    # "rollback")
+    CLOSING: Final[tuple[str]] = "commit", "rollback"
+
+    def __init__(self, path: Path):
+        self.path: Path = path
+
+        self._lock: threading.Lock = threading.Lock()
+        self._file = None
+
+    @staticmethod
+    def read(path: Path) -> list[dict]:
+        records = []
+
+        with open(path, "rt") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A record cut by a crash while being appended: it's the last one, and it's as if it were never written
+                    break
+
+                # Only the last transaction matters
+                if record["type"] == "begin":
+                    records = []
+
+                records.append(record)
+
+        return records
+
+    @staticmethod
+    def is_open(records: list[dict]) -> bool:
+        return bool(records) and records[-1]["type"] not in Journal.CLOSING
+
+    def __enter__(self) -> "Journal":
+        self._file = open(self.path, "ab")
+
+        return self
+
+    def __exit__(self, *_):
+        self._file.close()
+
+    def append(self, record: dict, sync: bool = False):
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+            if sync:
+                os.fsync(self._file.fileno())
+
+
+def identity(fingerprint: Optional[str]) -> Optional[str]:
+    # The fingerprint without the mtime, which changes at every patch: a different identity means a different binary
+    return fingerprint.rsplit(":", 1)[0] if fingerprint is not None else None
+
+
+def plan_target(target: NcduColors, config: Union[Config, Patch], journal: Journal) -> dict:
+    offset = target.locate()
+
+    current = target.binary[offset: offset + target.table_length]
+    new = encode(config, target, offset)
+
+    if len(new) != len(current):
+        raise ValueError(f"The config's table is {len(new)} bytes long, but Ncdu {'.'.join(map(str, target.version))}'s is {len(current)}.")
+
+    if not (ranges := NcduColors.changed_ranges(current, new)):
+        return {"status": "unchanged", "bytes_written": 0}
+
+    if target.backups is not None:
+        target.backups.record(target.ncdu, version=target.version, byteorder=target.byteorder, darkbg=target.supports_darkbg,
+                              offset=offset, current=current, new=new)
+
+    # Only the changed bytes are journaled: a few bytes per binary, usually
+    journal.append({
+        "type": "patch",
+        "path": str(target.ncdu),
+        "fingerprint": Cache.fingerprint(target.ncdu),
+        "offset": offset,
+        "ranges": [[start, current[start:end].hex(), new[start:end].hex()] for start, end in ranges]
+    })
+
+    return {"status": "planned"}
+
+
+@traced("write")
+def write_ranges(record: dict, rollback: bool = False) -> int:
+    path = Path(record["path"])
+
+    if identity(Cache.fingerprint(path)) != identity(record["fingerprint"]):
+        raise ValueError("The binary has been replaced since the journal was written.")
+
+    fd = os.open(path, os.O_RDWR)
+
+    try:
+        # Written in place (a transaction can't replace the binaries): its other links would be patched too
+        if os.fstat(fd).st_nlink > 1:
+            raise ValueError("The binary has other hard links: it can't be patched in place (apply the config with --atomic instead).")
+
+        # As NcduColors.write_table, against other writers
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+        writes = []
+
+        # Every range is checked before any is written: the binary is either patched (or restored) whole or not at all
+        for start, old, new in record["ranges"]:
+            expected, wanted = (bytes.fromhex(new), bytes.fromhex(old)) if rollback else (bytes.fromhex(old), bytes.fromhex(new))
+
+            current = os.pread(fd, len(wanted), record["offset"] + start)
+
+            if current == wanted:
+                continue
+
+            if current != expected:
+                raise ValueError(f"The binary has been modified at offset {record['offset'] + start} since the journal was written.")
+
+            writes.append((record["offset"] + start, wanted))
+
+        for position, data in writes:
+            os.pwrite(fd, data, position)
+
+        # Always (even without writes: a crashed run might have left them in the page cache only): the journal must
+        # never tell a binary is done before its bytes are on the disk
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    counters.written += (written := sum(len(data) for _, data in writes))
+
+    return written
+
+
+def commit_record(record: dict, journal: Journal, fsync: bool = False) -> dict:
+    start = time.perf_counter()
+
+    try:
+        written = write_ranges(record)
+
+        # The binary is synced anyway: syncing its record too only spares a resume checking it again
+        journal.append({"type": "done", "path": record["path"]}, sync=fsync)
+
+        result = {"path": record["path"], "status": "changed" if written else "unchanged", "bytes_written": written}
+    except Exception as exception:
+        result = {"path": record["path"], "status": "error", "error": str(exception) or type(exception).__name__}
+
+    result["seconds"] = round(time.perf_counter() - start, 6)
+
+    return result
+
+
+def apply_transaction(targets: Iterable[Path], config: Union[Config, Patch], path: Path, *, workers: int, execute: bool = True,
+                      cache: Optional[Cache] = None, backups: Optional[BackupStore] = None, fsync: bool = False) -> Iterator[dict]:
+    if path.exists() and Journal.is_open(Journal.read(path)):
+        raise ValueError(f"The journal {str(path)!r} has an unfinished transaction: resume it or roll it back first.")
+
+    with Journal(path) as journal:
+        journal.append({"type": "begin", "time": time.time()})
+
+        # First, every patch is journaled...
+        for result in run_many(partial(run_one, plan_target), targets, workers=workers, config=config, journal=journal, execute=execute,
+                               cache=cache, backups=backups):
+            if result["status"] != "planned":
+                yield result
+
+        # ...with the backups of the tables to be overwritten...
+        if backups is not None:
+            backups.save()
+
+        # ...and synced once. Only then the binaries are written.
+        journal.append({"type": "planned"}, sync=True)
+
+    yield from resume(path, workers=workers, fsync=fsync)
+
+
+def resume(path: Path, *, workers: int, fsync: bool = False) -> Iterator[dict]:
+    records = Journal.read(path)
+
+    if not Journal.is_open(records):
+        return
+
+    # Interrupted while planning: the patches journaled might not be all of them, and no binary was written yet
+    if records[0]["type"] != "begin" or not any(record["type"] == "planned" for record in records):
+        raise ValueError(f"The transaction of the journal {str(path)!r} was interrupted before being planned: roll it back.")
+
+    done = {record["path"] for record in records if record["type"] == "done"}
+
+    with Journal(path) as journal:
+        pending = (record for record in records if record["type"] == "patch" and record["path"] not in done)
+
+        failures = 0
+
+        for result in run_many(commit_record, pending, workers=workers, journal=journal, fsync=fsync):
+            failures += result["status"] == "error"
+
+            yield result
+
+        # A transaction with failures stays open: it can be resumed (once fixed) or rolled back
+        if not failures:
+            journal.append({"type": "commit", "time": time.time()}, sync=True)
+
+
+def rollback(path: Path) -> Iterator[dict]:
+    records = Journal.read(path)
+
+    if records and records[-1]["type"] == "rollback":
+        return
+
+    with Journal(path) as journal:
+        failures = 0
+
+        for record in reversed([record for record in records if record["type"] == "patch"]):
+            start = time.perf_counter()
+
+            try:
+                written = write_ranges(record, rollback=True)
+
+                result = {"path": record["path"], "status": "changed" if written else "unchanged", "bytes_written": written}
+            except Exception as exception:
+                failures += 1
+
+                result = {"path": record["path"], "status": "error", "error": str(exception) or type(exception).__name__}
+
+            result["seconds"] = round(time.perf_counter() - start, 6)
+
+            yield result
+
+        if not failures:
+            journal.append({"type": "rollback", "time": time.time()}, sync=True)
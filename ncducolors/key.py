@@ -1,3 +1,4 @@
+import struct
 from functools import cache
 
 from ncducolors.attribute import Attribute
@@ -38,5 +39,5 @@ class Key:
             "a": self.a.as_string
         }
 
-    def as_bytes(self, byteorder: Endianness = "little", **kwargs) -> bytes:
-        return b''.join(map(lambda f: f.get_code(byteorder=byteorder, **kwargs), (self.fg, self.bg, self.a)))
+    def as_bytes(self, byteorder: Endianness = "little") -> bytes:
+        return struct.pack(Key.get_format(byteorder=byteorder), self.fg.value, self.bg.value, self.a.value)
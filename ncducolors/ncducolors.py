@@ -1,76 +1,292 @@
+import fcntl
 import mmap
-import struct
-from functools import cache
+import os
+import re
+import shutil
+import stat
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
 from pathlib import Path
 from subprocess import run
-from typing import Optional, Final
-
-from . import Endianness
+from typing import Callable, Iterator, Optional, Final, Union
+
+from . import Buffer, Endianness
+from .backup import BackupStore
+from .cache import Cache
+from .codec import Codec
+from .elf import Elf, Section, Symbol
+from .hooks import Hook, counters, subscribe, traced, unsubscribe
+from .search import Locator, Match, Matcher, search_chunk
 from .sequence import Sequence
 from .attribute import Attribute
 from .color import Color
 from .config import Config
 from .key import Key
+from .patch import Patch
 from .theme import Theme
 
 
+class VersionNotFoundError(ValueError):
+    pass
+
+
 class NcduColors:
-    def __init__(self, ncdu: Path):
+    # The binary is never copied into memory: it is mapped read-only (shared, so that writes are visible through it) and
+    # scanned in windows of this size, dropping each window's pages from the mapping once searched. Thus the peak memory
+    # usage is bounded by WINDOW + len(pattern) mapped bytes plus the decoded table (a few hundred bytes), whatever the
+    # binary size.
+    WINDOW: Final[int] = 1 << 20
+
+    # With more than one worker, the data sections are split in chunks of CHUNK_WINDOWS windows, each searched by a
+    # worker process (regular expressions hold the GIL), if they are big enough to be worth starting the processes
+    CHUNK_WINDOWS: Final[int] = 16
+    PARALLEL_THRESHOLD: Final[int] = 64 << 20
+
+    # Ncdu embeds its version in the header bar ("ncdu 1.15.1 ~ Use the arrow keys...") and in the JSON export header
+    VERSION_PATTERN: Final[re.Pattern] = re.compile(rb'(?:ncdu |"progver":")(\d+(?:\.\d+)+)')
+
+    # Name of Ncdu's theme table (see Ncdu's src/util.c), only listed in the symbol table of unstripped builds
+    SYMBOL: Final[str] = "color_defs"
+
+    # ioctl cloning a whole file (as "cp --reflink"), see linux/fs.h
+    FICLONE: Final[int] = 0x40049409
+
+    def __init__(self, ncdu: Path, execute: bool = True, cache: Optional[Cache] = None, version: Optional[str] = None,
+                 backups: Optional[BackupStore] = None, workers: int = 1, memory: Optional[int] = None):
         self.ncdu: Path = ncdu.absolute()
 
-        self.version: tuple[int] = self._load_version()
-        self.supports_darkbg = self.version >= (1, 17)
+        self.workers: int = max(workers, 1)
+
+        # At most `memory` bytes of the binary are resident at once, whatever the number of workers (the overlap of the
+        # windows, shorter than a table, fits in the page kept aside for it)
+        self.window: int = NcduColors.WINDOW if memory is None else \
+            max(memory // self.workers - mmap.PAGESIZE, mmap.PAGESIZE) // mmap.PAGESIZE * mmap.PAGESIZE
+
+        self.binary: mmap.mmap = self._map()
 
-        self.binary: bytearray = bytearray(self.ncdu.read_bytes())
+        self.elf: Elf = Elf(self.binary)
+        self.byteorder: Endianness = self.elf.byteorder
 
-        # See https://en.wikipedia.org/wiki/Executable_and_Linkable_Format
-        if self.binary[5] == 1:
-            self.byteorder: Endianness = "little"
-        elif self.binary[5] == 2:
-            self.byteorder: Endianness = "big"
+        self.cache: Optional[Cache] = cache
+        self.backups: Optional[BackupStore] = backups
+        self.cached_offset: Optional[int] = None
+
+        if cache is not None and (entry := cache.get(self.ncdu, self.binary, self.byteorder)) is not None:
+            self.version: tuple[int] = tuple(entry["version"])
+            self.supports_darkbg: bool = entry["darkbg"]
+            self.cached_offset = entry["offset"]
+        elif version is not None:
+            self.version: tuple[int] = NcduColors.parse_version(version)
+            self.supports_darkbg: bool = self.version >= (1, 17)
         else:
-            raise ValueError("Malformed ELF file.")
+            self.version: tuple[int] = self._load_version(execute=execute)
+            self.supports_darkbg: bool = self.version >= (1, 17)
 
-    @cache
-    def _load_version(self) -> tuple[int]:
-        command = run([self.ncdu, "--version"], capture_output=True)
+    @staticmethod
+    def subscribe(hook: Hook):
+        # The hook is called with every phase (search, decode, write...) of every instance, on the thread running it
+        subscribe(hook)
 
-        command.check_returncode()
+    @staticmethod
+    def unsubscribe(hook: Hook):
+        unsubscribe(hook)
+
+    def __enter__(self) -> "NcduColors":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self.binary.close()
+
+    def _map(self) -> mmap.mmap:
+        with open(self.ncdu, "rb") as file:
+            status = os.fstat(file.fileno())
+
+            # The file being mapped (it might be replaced later, keeping the same path)
+            self.identity: tuple[int, int] = status.st_dev, status.st_ino
+
+            try:
+                return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError("Malformed ELF file.")
+
+    def _remap(self):
+        self.binary.close()
+
+        self.binary = self._map()
+        self.elf = Elf(self.binary)
+
+        # The symbol table might be another one too
+        self.__dict__.pop("_symbol", None)
+
+    def _regions(self, sections: tuple[Section]) -> list[tuple[int, int]]:
+        # Binaries without section headers (e.g. "super-stripped" ones) are searched as a whole
+        return [(section.offset, section.end) for section in sections] if self.elf.sections else [(0, len(self.binary))]
+
+    def _windows(self, overlap: int, sections: tuple[Section]) -> Iterator[tuple[int, int]]:
+        for region_start, region_end in self._regions(sections):
+            for start in range(region_start, region_end, self.window):
+                end = min(start + self.window + overlap, region_end)
+
+                counters.read += end - start
+
+                yield start, end
+
+                if hasattr(mmap, "MADV_DONTNEED"):
+                    aligned_start = start - start % mmap.PAGESIZE
+
+                    self.binary.madvise(mmap.MADV_DONTNEED, aligned_start, end - aligned_start)
+
+    def _search_windows(self, matcher: Union[Matcher, Locator]) -> Iterator[list[Match]]:
+        for start, end in self._windows(overlap=matcher.longest - 1, sections=self.elf.data_sections()):
+            # A match starting in the overlap is found (whole) by the next window
+            yield [match for match in matcher.finditer(self.binary, start, end) if match.offset < start + self.window]
+
+    def _search_chunks(self, matcher: Union[Matcher, Locator], regions: list[tuple[int, int]]) -> Iterator[list[Match]]:
+        size = self.window * NcduColors.CHUNK_WINDOWS
+
+        chunks = ((start, min(start + size, region_end), region_end)
+                  for region_start, region_end in regions for start in range(region_start, region_end, size))
+
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        try:
+            pending = deque()
 
-        ncdu_literally, raw_version = command.stdout.decode("utf-8").split(maxsplit=1)
+            # The chunks are submitted (a few at a time) and yielded in order: an early stop skips the following ones only
+            for start, end, stop in chunks:
+                pending.append(executor.submit(search_chunk, str(self.ncdu), self.identity, matcher, start, end, stop, self.window))
+
+                counters.read += end - start
+
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    @traced("search")
+    def scan(self, matcher: Optional[Union[Matcher, Locator]] = None, until: Optional[Callable[[Match], bool]] = None) -> list[Match]:
+        matcher = matcher or Matcher()
+
+        regions = self._regions(self.elf.data_sections())
+
+        if self.workers > 1 and sum(end - start for start, end in regions) >= NcduColors.PARALLEL_THRESHOLD:
+            results = self._search_chunks(matcher, regions)
+        else:
+            results = self._search_windows(matcher)
+
+        matches = []
+
+        for window_matches in results:
+            for match in window_matches:
+                matches.append(match)
+
+                # The match looked for (when a single one is expected) was found: the rest of the binary isn't searched
+                if until is not None and until(match):
+                    results.close()
+
+                    return matches
+
+        return matches
+
+    @traced("version")
+    def _find_version(self) -> Optional[str]:
+        for start, end in self._windows(overlap=64, sections=self.elf.sections_named(".rodata")):
+            match = NcduColors.VERSION_PATTERN.search(self.binary, start, end)
+
+            # A match touching the window's end might be truncated: the next window (overlapping it) will find it whole
+            if match is not None and match.end() < end:
+                return match.group(1).decode("ascii")
+
+        return None
+
+    @staticmethod
+    def parse_version_output(ncdu: Path, output: bytes) -> str:
+        ncdu_literally, raw_version = output.decode("utf-8").split(maxsplit=1)
 
         if ncdu_literally != "ncdu":
-            raise ValueError(f"Executable {str(self.ncdu.absolute())!r} was not recognised as Ncdu.")
+            raise ValueError(f"Executable {str(ncdu.absolute())!r} was not recognised as Ncdu.")
 
+        return raw_version
+
+    @traced("exec")
+    def _execute_version(self) -> str:
+        command = run([self.ncdu, "--version"], capture_output=True)
+
+        command.check_returncode()
+
+        return NcduColors.parse_version_output(self.ncdu, command.stdout)
+
+    @staticmethod
+    def parse_version(raw_version: str) -> tuple[int]:
         version = tuple(map(int, raw_version.rsplit('-')[0].split('.')))
 
         if version >= (2, 0):
-            raise ValueError(f"Version 2.0+ ({raw_version}) is not supported yet.")
+            raise ValueError(f"Version 2.0+ ({raw_version.strip()}) is not supported yet.")
 
         return version
 
+    def _load_version(self, execute: bool = True) -> tuple[int]:
+        if (raw_version := self._find_version()) is None:
+            if not execute:
+                raise VersionNotFoundError(f"Executable {str(self.ncdu.absolute())!r} was not recognised as Ncdu (no version string found).")
+
+            raw_version = self._execute_version()
+
+        return NcduColors.parse_version(raw_version)
+
+    @property
+    def table_length(self) -> int:
+        return len(Sequence.get_default(with_darkbg=self.supports_darkbg, byteorder=self.byteorder))
+
+    def _remember(self, offset: int):
+        self.cached_offset = offset
+
+        if self.cache is not None:
+            self.cache.put(self.ncdu, self.binary, version=self.version, byteorder=self.byteorder, darkbg=self.supports_darkbg,
+                           offset=offset, length=self.table_length)
+
+    # Cached on the instance (not with functools.cache, which would keep every instance alive)
+    @cached_property
+    @traced("symbols")
+    def _symbol(self) -> Optional[Symbol]:
+        return self.elf.find_symbol(NcduColors.SYMBOL)
+
+    def _symbol_offset(self) -> Optional[int]:
+        symbol = self._symbol
+
+        if symbol is None or symbol.size != self.table_length:
+            return None
+
+        offset = self.elf.address_to_offset(symbol.address)
+
+        if offset is None or offset + symbol.size > len(self.binary):
+            return None
+
+        return offset
+
     @staticmethod
-    def binary_to_themes(*, binary: bytearray, offset: int, supports_darkbg: bool, byteorder: Endianness) -> tuple[Theme]:
+    @traced("decode")
+    def binary_to_themes(*, binary: Buffer, offset: int, supports_darkbg: bool, byteorder: Endianness) -> tuple[Theme]:
         if supports_darkbg:
             themes: tuple[Theme] = Theme("off"), Theme("dark"), Theme("darkbg")
         else:
             themes: tuple[Theme] = Theme("off"), Theme("dark")
 
-        key_format: Final[str] = Key.get_format(byteorder=byteorder)
-
-        expected_length: int = struct.calcsize(key_format)
+        values: tuple[int] = Codec.decode(binary, offset=offset, themes=len(themes), byteorder=byteorder)
 
-        full_binary_segment: bytearray = binary[offset: offset + expected_length * len(Theme.KEYS) * len(themes)]
+        counters.read += len(Sequence.get_default(with_darkbg=supports_darkbg, byteorder=byteorder))
 
         for i, key_str in enumerate(Theme.KEYS):
             for j, theme in enumerate(themes):
-                index = (len(themes) * i + j) * expected_length
-
-                binary_segment: bytearray = full_binary_segment[index : index + expected_length]
-
-                assert len(binary_segment) == expected_length
-
-                fg_raw, bg_raw, a_raw = struct.unpack(key_format, binary_segment)
+                fg_raw, bg_raw, a_raw = values[(len(themes) * i + j) * 3: (len(themes) * i + j) * 3 + 3]
 
                 key = Key(
                     fg=Color.by_value(fg_raw),
@@ -86,10 +302,7 @@ class NcduColors:
         if offset is not None:
             effective_offset = offset
         else:
-            try:
-                effective_offset = self.extract_default_config().offset
-            except ValueError:
-                raise ValueError("'offset' is None and Ncdu doesn't have its default config in it. Please revert or specify the offset.")
+            effective_offset = self.locate()
 
         themes: tuple[Theme] = NcduColors.binary_to_themes(
             binary=self.binary,
@@ -100,15 +313,60 @@ class NcduColors:
 
         return Config(ncdu=self.ncdu, offset=effective_offset, **{theme.name: theme for theme in themes})
 
+    def locate(self) -> int:
+        if self.cached_offset is not None:
+            return self.cached_offset
+
+        if (symbol_offset := self._symbol_offset()) is not None:
+            self._remember(symbol_offset)
+
+            return symbol_offset
+
+        # Patched or not, the table is recognised by its structure
+        matches = self.scan(Locator(byteorder=self.byteorder))
+
+        if len(matches) > 1:
+            # The table layout found in the binary is more reliable than the one guessed from the version
+            matches = [match for match in matches if match.darkbg == self.supports_darkbg] or matches
+
+        if not matches:
+            raise ValueError("'offset' is None and Ncdu's config was not found in it. Please specify the offset.")
+
+        if len(matches) > 1:
+            raise ValueError(f"'offset' is None and Ncdu's config might be at any of the offsets {[match.offset for match in matches]}. "
+                             f"Please specify the offset.")
+
+        self.supports_darkbg = matches[0].darkbg
+
+        self._remember(matches[0].offset)
+
+        return matches[0].offset
+
     def extract_default_config(self) -> Config:
-        if self.byteorder == "little":
-            offset: int = self.binary.find(Sequence.DEFAULT_LE_WITH_DARKBG if self.supports_darkbg else Sequence.DEFAULT_LE_WITHOUT_DARKBG)
+        default_sequence: bytes = Sequence.get_default(with_darkbg=self.supports_darkbg, byteorder=self.byteorder)
+
+        if (offset := self.cached_offset) is not None or (offset := self._symbol_offset()) is not None:
+            if self.binary[offset: offset + len(default_sequence)] != default_sequence:
+                raise ValueError(f"Default config not found at offset {offset} (Ncdu has already been patched).\n"
+                                 "You can only to do a 'apply-config' (on the default config) or a 'revert'.")
         else:
-            offset: int = self.binary.find(Sequence.DEFAULT_BE_WITH_DARKBG if self.supports_darkbg else Sequence.DEFAULT_BE_WITHOUT_DARKBG)
+            # The scan stops at the first table of the expected layout
+            matches = self.scan(until=lambda match: not match.patched and match.byteorder == self.byteorder and
+                                match.darkbg == self.supports_darkbg)
+
+            matches = [match for match in matches if not match.patched and match.byteorder == self.byteorder]
+
+            if not matches:
+                raise ValueError("Default config pattern not found in the binary file.\n"
+                                 "You can only to do a 'apply-config' (on the default config) or a 'revert'.")
+
+            # The table layout found in the binary is more reliable than the one guessed from the version
+            match = next((match for match in matches if match.darkbg == self.supports_darkbg), matches[0])
 
-        if offset == -1:
-            raise ValueError("Default config pattern not found in the binary file.\n"
-                             "You can only to do a 'apply-config' (on the default config) or a 'revert'.")
+            offset: int = match.offset
+            self.supports_darkbg = match.darkbg
+
+        self._remember(offset)
 
         default_config: Config = self.load_config(offset=offset)
 
@@ -117,10 +375,7 @@ class NcduColors:
     @staticmethod
     def dump_internal_default_config(*, ncdu: Optional["Path"] = None, offset: Optional[int] = None, with_darkbg: bool,
                                      byteorder: Endianness = "little") -> Config:
-        if byteorder == "little":
-            binary = Sequence.DEFAULT_LE_WITH_DARKBG if with_darkbg else Sequence.DEFAULT_LE_WITHOUT_DARKBG
-        else:
-            binary = Sequence.DEFAULT_BE_WITH_DARKBG if with_darkbg else Sequence.DEFAULT_BE_WITHOUT_DARKBG
+        binary = Sequence.get_default(with_darkbg=with_darkbg, byteorder=byteorder)
 
         themes = NcduColors.binary_to_themes(binary=binary, offset=0, supports_darkbg=with_darkbg, byteorder=byteorder)
 
@@ -130,7 +385,160 @@ class NcduColors:
             **{theme.name: theme for theme in themes}
         )
 
-    def apply_config(self, new_config: Config) -> bool:
+    @staticmethod
+    def changed_ranges(current_bytes: bytes, new_bytes: bytes) -> list[tuple[int, int]]:
+        ranges: list[tuple[int, int]] = []
+
+        for i, (current_byte, new_byte) in enumerate(zip(current_bytes, new_bytes)):
+            if current_byte == new_byte:
+                continue
+
+            if ranges and ranges[-1][1] == i:
+                ranges[-1] = ranges[-1][0], i + 1
+            else:
+                ranges.append((i, i + 1))
+
+        return ranges
+
+    def _is_table(self, offset: int, length: int) -> bool:
+        match = next(Locator(byteorder=self.byteorder).finditer(self.binary, offset, offset + length), None)
+
+        if match is None or match.offset != offset:
+            return False
+
+        return length == len(Sequence.get_default(with_darkbg=match.darkbg, byteorder=self.byteorder))
+
+    @staticmethod
+    def lock(ncdu: Path, flags: int) -> int:
+        while True:
+            fd = os.open(ncdu, flags)
+
+            try:
+                # Advisory: it serializes NcduColors' own writers (of any process, and the artifact store's), not Ncdu
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+                locked, current = os.fstat(fd), os.stat(ncdu)
+            except BaseException:
+                os.close(fd)
+
+                raise
+
+            # The file might have been atomically replaced while waiting for the lock: the lock must be on the current one
+            if (locked.st_dev, locked.st_ino) == (current.st_dev, current.st_ino):
+                return fd
+
+            os.close(fd)
+
+    def _replace(self, source_fd: int, offset: int, new_bytes: bytes, ranges: list[tuple[int, int]], fsync: bool = False):
+        status = os.fstat(source_fd)
+
+        temporary = self.ncdu.with_name(f".{self.ncdu.name}.{os.getpid()}.{threading.get_ident()}")
+
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+
+        try:
+            try:
+                # A reflink shares the original's extents: only the patched block is actually copied (on CoW filesystems)
+                fcntl.ioctl(fd, NcduColors.FICLONE, source_fd)
+            except OSError:
+                with open(source_fd, "rb", closefd=False) as source, open(fd, "wb", closefd=False) as destination:
+                    shutil.copyfileobj(source, destination, NcduColors.WINDOW)
+
+            for start, end in ranges:
+                os.pwrite(fd, new_bytes[start:end], offset + start)
+
+            try:
+                os.fchown(fd, status.st_uid, status.st_gid)
+            except PermissionError:
+                pass
+
+            os.fchmod(fd, stat.S_IMODE(status.st_mode))
+
+            # The rename must never expose a clone whose content isn't on the disk yet
+            os.fsync(fd)
+
+            os.rename(temporary, self.ncdu)
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+
+            raise
+        finally:
+            os.close(fd)
+
+        if fsync:
+            directory_fd = os.open(self.ncdu.parent, os.O_RDONLY)
+
+            try:
+                os.fsync(directory_fd)
+            finally:
+                os.close(directory_fd)
+
+    @traced("write")
+    def write_table(self, offset: int, new_bytes: bytes, fsync: bool = False, atomic: bool = False) -> int:
+        current_bytes: bytes = self.binary[offset: offset + len(new_bytes)]
+
+        if len(current_bytes) != len(new_bytes):
+            raise ValueError(f"The config at offset {offset} is truncated (expected {len(new_bytes)} bytes).")
+
+        # Unless the binary has been replaced since it was mapped (then, the mapping is the old file's)
+        if current_bytes == new_bytes and self.identity == ((status := os.stat(self.ncdu)).st_dev, status.st_ino):
+            return 0
+
+        # A binary sharing its inode (hard links) is never written in place: its other links would be patched too
+        atomic = atomic or os.stat(self.ncdu).st_nlink > 1
+
+        # The file is kept open only for the time of the write: Linux refuses to execute a file open for writing (and vice
+        # versa, so a running Ncdu can only be patched atomically)
+        fd = NcduColors.lock(self.ncdu, os.O_RDONLY if atomic else os.O_WRONLY)
+
+        try:
+            # Replaced by another process (likely patching it atomically) after being mapped: unless it's a different
+            # binary, the new file is the one to patch
+            if self.identity != ((status := os.fstat(fd)).st_dev, status.st_ino):
+                self._remap()
+
+                # Its table might have been patched with any other config meanwhile: it only has to still be a table
+                if self.binary[offset: offset + len(new_bytes)] not in (current_bytes, new_bytes) and \
+                        not self._is_table(offset, len(new_bytes)):
+                    raise ValueError("The binary has been replaced since it was opened.")
+
+            # Compared again while holding the lock
+            current_bytes = self.binary[offset: offset + len(new_bytes)]
+
+            if not (ranges := NcduColors.changed_ranges(current_bytes, new_bytes)):
+                return 0
+
+            # The table is backed up before being overwritten
+            if self.backups is not None:
+                self.backups.record(self.ncdu, version=self.version, byteorder=self.byteorder, darkbg=self.supports_darkbg,
+                                    offset=offset, current=current_bytes, new=new_bytes)
+
+            if atomic:
+                self._replace(fd, offset, new_bytes, ranges, fsync=fsync)
+            else:
+                # Only the changed bytes are written, through the page cache (thus visible through the read-only mapping too)
+                for start, end in ranges:
+                    os.pwrite(fd, new_bytes[start:end], offset + start)
+
+                if fsync:
+                    os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if atomic:
+            self._remap()
+
+        # The file's mtime (and so its fingerprint) has changed
+        if offset == self.cached_offset:
+            self._remember(offset)
+
+        written = sum(end - start for start, end in ranges)
+
+        counters.written += written
+
+        return written
+
+    def apply_config(self, new_config: Config, fsync: bool = False, atomic: bool = False) -> int:
         offset: Optional[int] = new_config.offset
 
         current_config: Config = self.load_config(offset=offset)
@@ -141,16 +549,22 @@ class NcduColors:
         if new_config.darkbg is None and self.supports_darkbg:
             new_config.darkbg = current_config.darkbg
 
-        assert len(current_config.as_bytes()) == len(new_bytes := new_config.as_bytes())
+        new_bytes: bytes = new_config.as_bytes(byteorder=self.byteorder)
 
-        if current_config.as_dict() == new_config.as_dict():
-            return False
+        if len(new_bytes) != self.table_length:
+            raise ValueError(f"The config has {'3' if new_config.darkbg is not None else '2'} themes, "
+                             f"but Ncdu {'.'.join(map(str, self.version))} has {'3' if self.supports_darkbg else '2'}.")
+
+        return self.write_table(offset=offset, new_bytes=new_bytes, fsync=fsync, atomic=atomic)
+
+    def apply_patch(self, patch: Patch, fsync: bool = False, atomic: bool = False) -> int:
+        offset = self.locate()
 
-        with open(self.ncdu, "r+b") as edit:
-            self.binary[offset: offset + len(new_bytes)] = new_bytes
+        # The compiled table is written as is: no config (nor theme, key, color...) is decoded nor encoded
+        new_bytes = patch.table(themes=3 if self.supports_darkbg else 2, byteorder=self.byteorder,
+                                current=self.binary[offset: offset + self.table_length])
 
-            with mmap.mmap(edit.fileno(), 0) as mem:
-                mem.seek(offset)
-                mem.write(new_bytes)
+        if len(new_bytes) != self.table_length:
+            raise ValueError(f"The compiled patch's table is {len(new_bytes)} bytes long, but Ncdu's is {self.table_length}.")
 
-        return True
+        return self.write_table(offset=offset, new_bytes=new_bytes, fsync=fsync, atomic=atomic)
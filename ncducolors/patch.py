@@ -0,0 +1,140 @@
+import hashlib
+import json
+import struct
+from io import BufferedReader
+from typing import Final, Optional, Union
+
+from ncducolors import Buffer, Endianness
+from ncducolors.config import Config
+from ncducolors.hooks import counters, traced
+from ncducolors.key import Key
+from ncducolors.theme import Theme
+
+
+class Patch:
+    __slots__ = "tables",
+
+    MAGIC: Final[bytes] = b"NCDUPTCH"
+    FORMAT: Final[int] = 1
+
+    # Magic, format, number of tables; then, for each table, its layout (number of themes, byte order, length) and its
+    # bytes; finally, the checksum of everything before it
+    HEADER: Final[struct.Struct] = struct.Struct("<8sHB")
+    LAYOUT: Final[struct.Struct] = struct.Struct("<BBH")
+    CHECKSUM_SIZE: Final[int] = 16
+
+    # Size of a key ({fg, bg, attributes}) in the tables
+    KEY_SIZE: Final[int] = struct.calcsize(Key.get_format())
+
+    BYTEORDERS: Final[tuple[Endianness]] = "little", "big"
+
+    def __init__(self, tables: dict[tuple[int, Endianness], bytes]):
+        self.tables: dict[tuple[int, Endianness], bytes] = tables
+
+    @staticmethod
+    def checksum(data: Buffer) -> bytes:
+        return hashlib.blake2b(data, digest_size=Patch.CHECKSUM_SIZE).digest()
+
+    @staticmethod
+    def compile(config: Config) -> "Patch":
+        tables = {}
+
+        # A config with the darkbg theme also fits the binaries without it (as batches drop it on them). A config without
+        # it only has these tables: on the binaries with it, their current darkbg theme is kept (see table())
+        layouts = [Config(ncdu=None, offset=None, off=config.off, dark=config.dark)]
+
+        if config.darkbg is not None:
+            layouts.append(config)
+
+        for layout in layouts:
+            for byteorder in Patch.BYTEORDERS:
+                tables[3 if layout.darkbg is not None else 2, byteorder] = layout.as_bytes(byteorder=byteorder)
+
+        return Patch(tables)
+
+    @staticmethod
+    def is_patch(data: Buffer) -> bool:
+        return data[:len(Patch.MAGIC)] == Patch.MAGIC
+
+    @staticmethod
+    def from_bytes(data: Buffer) -> "Patch":
+        if len(data) < Patch.HEADER.size + Patch.CHECKSUM_SIZE or not Patch.is_patch(data):
+            raise ValueError("Not a compiled patch.")
+
+        body = memoryview(data)[:-Patch.CHECKSUM_SIZE]
+
+        if Patch.checksum(body) != data[-Patch.CHECKSUM_SIZE:]:
+            raise ValueError("The compiled patch is corrupted (checksum mismatch).")
+
+        _, version, count = Patch.HEADER.unpack_from(body)
+
+        if version != Patch.FORMAT:
+            raise ValueError(f"Unsupported compiled patch format {version} (expected {Patch.FORMAT}).")
+
+        tables = {}
+        position = Patch.HEADER.size
+
+        for _ in range(count):
+            if position + Patch.LAYOUT.size > len(body):
+                raise ValueError("The compiled patch is truncated.")
+
+            themes, byteorder, length = Patch.LAYOUT.unpack_from(body, position)
+            position += Patch.LAYOUT.size
+
+            if themes not in (2, 3) or byteorder >= len(Patch.BYTEORDERS) or length != themes * len(Theme.KEYS) * Patch.KEY_SIZE:
+                raise ValueError(f"Unsupported table layout in the compiled patch ({themes} themes, byte order {byteorder}, {length} bytes).")
+
+            if position + length > len(body):
+                raise ValueError("The compiled patch is truncated.")
+
+            tables[themes, Patch.BYTEORDERS[byteorder]] = bytes(body[position: position + length])
+            position += length
+
+        if position != len(body):
+            raise ValueError("The compiled patch is malformed.")
+
+        return Patch(tables)
+
+    def as_bytes(self) -> bytes:
+        body = bytearray(Patch.HEADER.pack(Patch.MAGIC, Patch.FORMAT, len(self.tables)))
+
+        for (themes, byteorder), table in self.tables.items():
+            body += Patch.LAYOUT.pack(themes, Patch.BYTEORDERS.index(byteorder), len(table))
+            body += table
+
+        return bytes(body + Patch.checksum(body))
+
+    @property
+    def keeps_darkbg(self) -> bool:
+        return not any(themes == 3 for themes, _ in self.tables)
+
+    def table(self, *, themes: int, byteorder: Endianness, current: Optional[Buffer] = None) -> bytes:
+        if (table := self.tables.get((themes, byteorder))) is not None:
+            return table
+
+        # Compiled from a config without the darkbg theme: as apply-config does, the current table's one is kept. The
+        # tables are arrays of keys (themes minor), so it is spliced in key by key, without decoding anything
+        if themes == 3 and self.keeps_darkbg and (table := self.tables.get((2, byteorder))) is not None and current is not None:
+            if len(current) != (length := len(table) // 2 * 3):
+                raise ValueError(f"The current table is {len(current)} bytes long, but a table with 3 themes is {length}.")
+
+            rows = []
+
+            for i in range(len(Theme.KEYS)):
+                row = 3 * Patch.KEY_SIZE * i
+
+                rows += table[2 * Patch.KEY_SIZE * i: 2 * Patch.KEY_SIZE * (i + 1)], current[row + 2 * Patch.KEY_SIZE: row + 3 * Patch.KEY_SIZE]
+
+            return b"".join(rows)
+
+        raise ValueError(f"The compiled patch has no table with {themes} themes ({byteorder}-endian).")
+
+
+@traced("parse")
+def read_config(reader: BufferedReader) -> Union[Config, Patch]:
+    with reader as file:
+        data = file.read()
+
+    counters.read += len(data)
+
+    return Patch.from_bytes(data) if Patch.is_patch(data) else Config.from_dict(json.loads(data))
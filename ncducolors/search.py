@@ -0,0 +1,140 @@
+import mmap
+import os
+import re
+import struct
+from itertools import islice
+from typing import Final, Iterator, Mapping, NamedTuple, Optional, Union
+
+from ncducolors import Buffer, Endianness
+from ncducolors.config import Config
+from ncducolors.key import Key
+from ncducolors.sequence import Sequence
+from ncducolors.theme import Theme
+
+
+class Match(NamedTuple):
+    offset: int
+    name: str
+    byteorder: Endianness
+    darkbg: bool
+    patched: bool
+
+    def describe(self) -> str:
+        state = f"patched with {self.name!r}" if self.patched else "unpatched"
+
+        return f"{state} ({self.byteorder}-endian, {'with' if self.darkbg else 'without'} darkbg)"
+
+
+class Matcher:
+    DEFAULT: Final[str] = "default"
+
+    def __init__(self, fingerprints: Optional[Mapping[str, Config]] = None):
+        self.layouts: dict[bytes, list[tuple[str, Endianness, bool, bool]]] = {}
+
+        for byteorder in ("little", "big"):
+            for darkbg in (True, False):
+                self._add(Sequence.get_default(with_darkbg=darkbg, byteorder=byteorder), Matcher.DEFAULT, byteorder, darkbg, False)
+
+            for name, config in (fingerprints or {}).items():
+                self._add(config.as_bytes(byteorder=byteorder), name, byteorder, config.darkbg is not None, True)
+
+        # Longest patterns first, so that a pattern being the prefix of another one doesn't shadow it
+        self.pattern: re.Pattern = re.compile(b"|".join(map(re.escape, sorted(self.layouts, key=len, reverse=True))))
+
+        self.longest: int = max(map(len, self.layouts))
+
+    def _add(self, sequence: bytes, name: str, byteorder: Endianness, darkbg: bool, patched: bool):
+        self.layouts.setdefault(sequence, []).append((name, byteorder, darkbg, patched))
+
+    def finditer(self, binary: Buffer, start: int = 0, end: Optional[int] = None) -> Iterator[Match]:
+        for match in self.pattern.finditer(binary, start, len(binary) if end is None else end):
+            for name, byteorder, darkbg, patched in self.layouts[match.group()]:
+                yield Match(offset=match.start(), name=name, byteorder=byteorder, darkbg=darkbg, patched=patched)
+
+
+class Locator:
+    NAME: Final[str] = "unknown"
+
+    def __init__(self, byteorder: Endianness):
+        self.byteorder: Endianness = byteorder
+
+        # Colors are 16-bit signed integers (-1 to 255), attributes are 32-bit flags (bits 16 to 30); the "off" theme
+        # never has colors. Thus every row begins with 0xffffffff: having it as the literal prefix of the pattern lets
+        # the regex engine jump from one candidate to the next, rather than trying every single byte.
+        if byteorder == "little":
+            color, attribute = rb"(?:[\x00-\xff]\x00|\xff\xff)", rb"\x00\x00[\x00-\xff][\x00-\x7f]"
+        else:
+            color, attribute = rb"(?:\x00[\x00-\xff]|\xff\xff)", rb"[\x00-\x7f][\x00-\xff]\x00\x00"
+
+        anchor = rb"\xff\xff\xff\xff" + attribute
+
+        layouts = []
+
+        # Both layouts (with and without darkbg) are looked for in the same pass, the longest one first
+        for other_themes in (2, 1):
+            other_keys = (color + color + attribute) * other_themes
+
+            layouts.append(b"(" + other_keys + b"(?:" + anchor + other_keys + b"){%d})" % (len(Theme.KEYS) - 1))
+
+        self.pattern: re.Pattern = re.compile(anchor + b"(?:" + b"|".join(layouts) + b")")
+
+        self.longest: int = len(Sequence.get_default(with_darkbg=True, byteorder=byteorder))
+
+        self.key_format: str = Key.get_format(byteorder=byteorder)
+
+    def finditer(self, binary: Buffer, start: int = 0, end: Optional[int] = None) -> Iterator[Match]:
+        end = len(binary) if end is None else end
+
+        while (match := self.pattern.search(binary, start, end)) is not None:
+            darkbg = match.lastindex == 1
+            table = match.group()
+
+            # Arrays of (-1, -1, 0) are common enough: the off theme, having no colors, needs attributes to be usable
+            if not any(a for _, _, a in islice(struct.iter_unpack(self.key_format, table), 0, None, 3 if darkbg else 2)):
+                start = match.start() + 1
+                continue
+
+            patched = table != Sequence.get_default(with_darkbg=darkbg, byteorder=self.byteorder)
+
+            yield Match(
+                offset=match.start(),
+                name=Locator.NAME if patched else Matcher.DEFAULT,
+                byteorder=self.byteorder,
+                darkbg=darkbg,
+                patched=patched
+            )
+
+            start = match.end()
+
+
+def search_chunk(path: str, identity: tuple[int, int], matcher: Union[Matcher, Locator], start: int, end: int, stop: int,
+                 window: int) -> list[Match]:
+    # Run by a worker process: it maps its own view of [start, end) only (plus the overlap, up to the region's stop),
+    # shared with the other workers through the page cache
+    overlap = matcher.longest - 1
+
+    with open(path, "rb") as file:
+        if ((status := os.fstat(file.fileno())).st_dev, status.st_ino) != identity:
+            raise ValueError("The binary has been replaced since it was opened.")
+
+        base = start - start % mmap.ALLOCATIONGRANULARITY
+        length = min(end + overlap, stop) - base
+
+        with mmap.mmap(file.fileno(), length, offset=base, access=mmap.ACCESS_READ) as view:
+            matches = []
+
+            for window_start in range(start - base, end - base, window):
+                window_end = min(window_start + window + overlap, length)
+
+                # A match starting in the overlap is found (whole) by the next window, or by the next chunk
+                limit = min(window_start + window, end - base)
+
+                matches.extend(match._replace(offset=match.offset + base) for match in matcher.finditer(view, window_start, window_end)
+                               if match.offset < limit)
+
+                if hasattr(mmap, "MADV_DONTNEED"):
+                    aligned_start = window_start - window_start % mmap.PAGESIZE
+
+                    view.madvise(mmap.MADV_DONTNEED, aligned_start, window_end - aligned_start)
+
+    return matches
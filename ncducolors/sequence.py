@@ -1,5 +1,7 @@
 from typing import Final
 
+from ncducolors import Endianness
+
 
 class Sequence:
     DEFAULT_LE_WITHOUT_DARKBG: Final[bytes] = (
@@ -73,3 +75,10 @@ class Sequence:
         b'\xff\xff\xff\xff\x00\x00\x00\x00\x00\x05\xff\xff\x00\x00\x00\x00\x00\x05\x00\x00\x00\x00\x00\x00'
         b'\xff\xff\xff\xff\x00\x04\x00\x00\x00\x05\x00\x02\x00\x00\x00\x00\x00\x05\x00\x02\x00\x00\x00\x00'
     )
+
+    @staticmethod
+    def get_default(*, with_darkbg: bool, byteorder: Endianness) -> bytes:
+        if byteorder == "little":
+            return Sequence.DEFAULT_LE_WITH_DARKBG if with_darkbg else Sequence.DEFAULT_LE_WITHOUT_DARKBG
+        else:
+            return Sequence.DEFAULT_BE_WITH_DARKBG if with_darkbg else Sequence.DEFAULT_BE_WITHOUT_DARKBG
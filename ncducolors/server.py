@@ -0,0 +1,159 @@
+import json
+import os
+import socketserver
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Final, Optional
+
+from ncducolors.backup import BackupStore
+from ncducolors.batch import apply_target, audit_target, revert_target
+from ncducolors.cache import Cache
+from ncducolors.config import Config
+from ncducolors.ncducolors import NcduColors
+
+
+class Binary:
+    __slots__ = "lock", "ncdu", "fingerprint", "used"
+
+    def __init__(self):
+        self.lock: threading.Lock = threading.Lock()
+        self.ncdu: Optional[NcduColors] = None
+        self.fingerprint: Optional[str] = None
+        self.used: float = time.monotonic()
+
+
+class Registry:
+    # Each binary keeps a mapping (and a file descriptor) open: the daemon only keeps the most recently used ones
+    MAX_BINARIES: Final[int] = 256
+    MAX_IDLE: Final[float] = 3600.0
+
+    def __init__(self, execute: bool = True, cache: Optional[Cache] = None, backups: Optional[BackupStore] = None,
+                 max_binaries: int = MAX_BINARIES, max_idle: float = MAX_IDLE):
+        self.execute: bool = execute
+        self.cache: Optional[Cache] = cache
+        self.backups: Optional[BackupStore] = backups
+
+        self.max_binaries: int = max_binaries
+        self.max_idle: float = max_idle
+
+        self.binaries: dict[Path, Binary] = {}
+
+        self._lock: threading.Lock = threading.Lock()
+
+    def _evict(self, now: float):
+        # Least recently used first: a binary is moved to the end of the (ordered) dict whenever it's used
+        for path, binary in list(self.binaries.items()):
+            if len(self.binaries) <= self.max_binaries and now - binary.used <= self.max_idle:
+                break
+
+            # A binary being used isn't idle. A request already holding an evicted binary maps it again, until it's collected.
+            if not binary.lock.acquire(blocking=False):
+                continue
+
+            try:
+                if binary.ncdu is not None:
+                    binary.ncdu.close()
+                    binary.ncdu = None
+
+                binary.fingerprint = None
+            finally:
+                binary.lock.release()
+
+            del self.binaries[path]
+
+    def run(self, path: Path, function: Callable[[NcduColors], dict]) -> dict:
+        with self._lock:
+            binary = self.binaries.pop(path, None) or Binary()
+            binary.used = time.monotonic()
+
+            self.binaries[path] = binary
+
+            self._evict(binary.used)
+
+        # Requests for the same binary are serialized, requests for different binaries are not
+        with binary.lock:
+            fingerprint = Cache.fingerprint(path)
+
+            # A new inode (e.g. a package upgrade) or mtime (e.g. another process patching it) invalidates the state
+            if binary.fingerprint != fingerprint:
+                if binary.ncdu is not None:
+                    binary.ncdu.close()
+                    binary.ncdu = None
+
+                binary.ncdu = NcduColors(ncdu=path, execute=self.execute, cache=self.cache, backups=self.backups)
+                binary.fingerprint = fingerprint
+
+            result = function(binary.ncdu)
+
+            # The binary's own writes keep the state valid: they go through the page cache, so through the mapping too
+            binary.fingerprint = Cache.fingerprint(path)
+
+            return result
+
+    def close(self):
+        with self._lock:
+            for binary in self.binaries.values():
+                with binary.lock:
+                    if binary.ncdu is not None:
+                        binary.ncdu.close()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    ACTIONS: Final[dict[str, Callable[..., dict]]] = {
+        "extract": lambda ncdu, request: {"config": ncdu.extract_default_config().as_dict()},
+        "apply": lambda ncdu, request: apply_target(ncdu, Config.from_dict(request["config"]), fsync=request.get("fsync", False),
+                                                    atomic=request.get("atomic", False)),
+        "revert": lambda ncdu, request: revert_target(ncdu, fsync=request.get("fsync", False), atomic=request.get("atomic", False)),
+        "audit": lambda ncdu, request: audit_target(ncdu, Config.from_dict(request["config"])),
+    }
+
+    server: "Server"
+
+    def handle(self):
+        # One JSON request per line, answered by one JSON line
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+
+                if (action := RequestHandler.ACTIONS.get(request.get("action"))) is None:
+                    raise ValueError(f"Unknown action {request.get('action')!r} (expected one of {list(RequestHandler.ACTIONS)}).")
+
+                path = Path(request["ncdu"]).expanduser().absolute()
+
+                response = {"ok": True} | self.server.registry.run(path, lambda ncdu: action(ncdu, request))
+            except Exception as exception:
+                response = {"ok": False, "error": str(exception) or type(exception).__name__}
+
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket: Path, registry: Registry):
+        # A socket left behind by a previous (crashed) server would make the bind fail
+        if socket.exists() and stat.S_ISSOCK(socket.stat().st_mode):
+            socket.unlink()
+
+        self.registry: Registry = registry
+
+        # The socket allows anyone who can connect to patch binaries: only the owner can
+        umask = os.umask(0o177)
+
+        try:
+            super().__init__(str(socket), RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super().server_close()
+
+        self.registry.close()
+
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
@@ -0,0 +1,150 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Final, Iterable, Iterator, Optional, Union
+
+from ncducolors.backup import BackupStore
+from ncducolors.batch import apply_one
+from ncducolors.cache import Cache
+from ncducolors.config import Config
+from ncducolors.patch import Patch
+
+
+class Watcher:
+    IN_CLOSE_WRITE: Final[int] = 0x00000008
+    IN_MOVED_TO: Final[int] = 0x00000080
+    IN_NONBLOCK: Final[int] = 0o4000
+    IN_CLOEXEC: Final[int] = 0o2000000
+
+    # struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+    EVENT: Final[struct.Struct] = struct.Struct("iIII")
+
+    # A package upgrade (or a copy) produces a burst of events: they are handled together once quiet for DEBOUNCE
+    # seconds, but never later than MAX_DELAY seconds after the first one
+    DEBOUNCE: Final[float] = 0.2
+    MAX_DELAY: Final[float] = 0.8
+
+    def __init__(self, targets: list[Path]):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+            inotify_init1, self._inotify_add_watch = libc.inotify_init1, libc.inotify_add_watch
+        except (AttributeError, OSError):
+            raise ValueError("inotify is not available on this system.")
+
+        self._inotify_add_watch.argtypes = ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32
+
+        if (fd := inotify_init1(Watcher.IN_NONBLOCK | Watcher.IN_CLOEXEC)) < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+        self.fd: int = fd
+
+        # Files replaced by renaming (as package managers do) would be lost by watching them directly: their directory
+        # is watched instead
+        self.targets: dict[tuple[int, bytes], Path] = {}
+
+        for target in targets:
+            path = target.resolve()
+
+            self.targets[self._add_watch(path.parent), os.fsencode(path.name)] = target
+
+    def _add_watch(self, directory: Path) -> int:
+        if (wd := self._inotify_add_watch(self.fd, os.fsencode(directory), Watcher.IN_CLOSE_WRITE | Watcher.IN_MOVED_TO)) < 0:
+            errno = ctypes.get_errno()
+
+            raise OSError(errno, f"Cannot watch {str(directory)!r}: {os.strerror(errno)}")
+
+        return wd
+
+    def __enter__(self) -> "Watcher":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        os.close(self.fd)
+
+    def _read(self) -> Iterator[Path]:
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return
+
+        position = 0
+
+        while position < len(data):
+            wd, mask, cookie, length = Watcher.EVENT.unpack_from(data, position)
+
+            name = data[position + Watcher.EVENT.size: position + Watcher.EVENT.size + length].rstrip(b"\x00")
+
+            position += Watcher.EVENT.size + length
+
+            if (target := self.targets.get((wd, name))) is not None:
+                yield target
+
+    def changes(self) -> Iterator[set[Path]]:
+        changed: set[Path] = set()
+        first = last = 0.0
+
+        while True:
+            timeout: Optional[float] = None
+
+            if changed:
+                timeout = max(0.0, min(last + Watcher.DEBOUNCE, first + Watcher.MAX_DELAY) - time.monotonic())
+
+            # Blocks without any timeout while nothing has changed: no CPU is used while idle
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+
+            if readable:
+                now = time.monotonic()
+
+                for target in self._read():
+                    if not changed:
+                        first = now
+
+                    changed.add(target)
+                    last = now
+
+                if not changed or time.monotonic() < first + Watcher.MAX_DELAY:
+                    continue
+
+            if changed:
+                yield changed
+
+                changed = set()
+
+
+def watch(targets: Iterable[Path], config: Union[Config, Patch], *, execute: bool = True, cache: Optional[Cache] = None,
+          backups: Optional[BackupStore] = None) -> Iterator[dict]:
+    targets = list(targets)
+
+    # Fingerprints of the binaries as left by the last apply: the events caused by the apply itself are ignored
+    applied: dict[Path, str] = {}
+
+    def apply(target: Path) -> Optional[dict]:
+        try:
+            if applied.get(target) == Cache.fingerprint(target):
+                return None
+        except OSError:
+            # Removed (and maybe about to be replaced): the error is reported
+            pass
+
+        result = apply_one(target, config, execute=execute, cache=cache, backups=backups)
+
+        try:
+            applied[target] = Cache.fingerprint(target)
+        except OSError:
+            pass
+
+        return result
+
+    with Watcher(targets) as watcher:
+        yield from filter(None, map(apply, targets))
+
+        for changed in watcher.changes():
+            yield from filter(None, map(apply, changed))
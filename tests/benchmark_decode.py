@@ -0,0 +1,35 @@
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors, Theme  # noqa: E402
+from ncducolors.attribute import Attribute  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+
+
+NUMBER = 2000
+
+
+def measure(name: str, statement, keys: int = 1):
+    seconds = min(timeit.repeat(statement, number=NUMBER, repeat=5)) / NUMBER
+
+    print(f"{name:<40} {seconds * 1e6:10.3f} µs {seconds * 1e6 / keys:10.3f} µs/key")
+
+
+def main():
+    keys = len(Theme.KEYS) * 3
+
+    config = NcduColors.dump_internal_default_config(with_darkbg=True)
+
+    measure("Color.by_value", lambda: Color.by_value(208))
+    measure("Color.as_string", lambda: Color.COLOR208.as_string)
+    measure("Attribute.as_string", lambda: (Attribute.BOLD | Attribute.REVERSE).as_string)
+    measure("binary_to_themes (3 themes)", lambda: NcduColors.dump_internal_default_config(with_darkbg=True), keys=keys)
+    measure("Config.as_dict (3 themes)", config.as_dict, keys=keys)
+    measure("Config.as_bytes (3 themes)", config.as_bytes, keys=keys)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, TypeVar
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.batch import apply_many, audit_many, revert_target, run_many, run_one  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from ncducolors.hooks import counters  # noqa: E402
+from synthetic_elf import build, parse_size  # noqa: E402
+
+
+T = TypeVar("T")
+
+BASELINE = Path(__file__).with_name("benchmark_baseline.json")
+
+BATCH_BINARIES = 32
+BATCH_WORKERS = 8
+
+# Below these differences, a slower run is noise, whatever the ratio
+NOISE_SECONDS = 0.002
+NOISE_RSS_MIB = 4.0
+
+# Duration each throughput is measured over: below the noise floor, a slower duration doesn't make a lower throughput a
+# regression either
+DURATIONS = {"throughput_mib_s": "extract", "binaries_s": "apply_many"}
+
+
+def timed(function: Callable[[], T]) -> tuple[float, T]:
+    start = time.perf_counter()
+
+    result = function()
+
+    return time.perf_counter() - start, result
+
+
+def peak_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_binary_case(path: Path, repeat: int) -> dict:
+    results = {"construct": [], "extract": [], "apply": [], "revert": []}
+    scanned = 0
+
+    for _ in range(repeat):
+        seconds, target = timed(lambda: NcduColors(ncdu=path, execute=False))
+        results["construct"].append(seconds)
+
+        with target:
+            read = counters.read
+            seconds, config = timed(target.extract_default_config)
+            results["extract"].append(seconds)
+
+            # The bytes the search actually went through (e.g. .rodata only), not the whole file
+            scanned = counters.read - read
+
+        config.dark.default.fg = Color.RED
+
+        # Every step works on a new instance: nothing (e.g. the offset) is reused from the previous one
+        with NcduColors(ncdu=path, execute=False) as target:
+            results["apply"].append(timed(lambda: target.apply_config(config))[0])
+
+        with NcduColors(ncdu=path, execute=False) as target:
+            results["revert"].append(timed(lambda: revert_target(target))[0])
+
+    metrics = {name: min(seconds) for name, seconds in results.items()}
+
+    metrics["throughput_mib_s"] = scanned / (1 << 20) / metrics["extract"]
+    metrics["peak_rss_mib"] = peak_rss_mib()
+
+    return metrics
+
+
+def run_batch_case(directory: Path, repeat: int) -> dict:
+    targets = sorted(directory.iterdir())
+
+    with NcduColors(ncdu=targets[0], execute=False) as target:
+        config = target.extract_default_config()
+        config.dark.default.fg = Color.RED
+
+    results = {"apply_many": [], "audit_many": [], "revert_many": []}
+
+    for _ in range(repeat):
+        results["apply_many"].append(timed(lambda: list(apply_many(targets, config, workers=BATCH_WORKERS)))[0])
+        results["audit_many"].append(timed(lambda: list(audit_many(targets, config, workers=BATCH_WORKERS)))[0])
+        results["revert_many"].append(timed(lambda: list(run_many(partial(run_one, revert_target), targets, workers=BATCH_WORKERS)))[0])
+
+    metrics = {name: min(seconds) for name, seconds in results.items()}
+
+    metrics["binaries_s"] = len(targets) / metrics["apply_many"]
+    metrics["peak_rss_mib"] = peak_rss_mib()
+
+    return metrics
+
+
+def run_isolated(*args: str) -> dict:
+    # Each case runs in its own process: the peak RSS is the case's own, not the one of the largest case so far
+    output = subprocess.run([sys.executable, __file__, "--run", *args], check=True, capture_output=True, text=True).stdout
+
+    return json.loads(output)
+
+
+def compare(name: str, metrics: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+
+    for metric, value in metrics.items():
+        reference = baseline.get(metric)
+
+        # Throughputs (per second) are better when higher; durations and memory when lower
+        higher_is_better = metric.endswith("_s")
+
+        if not reference:
+            status = "new"
+        elif higher_is_better:
+            # The same work at the baseline's rate would have taken that much less time
+            seconds = metrics[DURATIONS[metric]]
+            slower = seconds - seconds * value / reference
+
+            status = "REGRESSION" if value < reference / (1 + tolerance) and slower > NOISE_SECONDS else "ok"
+        else:
+            noise = NOISE_RSS_MIB if metric.endswith("_mib") else NOISE_SECONDS
+            status = "REGRESSION" if value > reference * (1 + tolerance) and value - reference > noise else "ok"
+
+        ratio = f"{value / reference:8.2f}x" if reference else " " * 9
+
+        print(f"  {metric:<20} {value:14.6f} {reference if reference is not None else float('nan'):14.6f} {ratio} {status}")
+
+        if status == "REGRESSION":
+            regressions.append(f"{name}: {metric}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NcduColors on synthetic ELF files")
+    parser.add_argument("--sizes", default="1M,16M", help="Comma-separated sizes of the binaries (e.g. 1M,64M,1G)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case (the fastest one is kept)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="Baseline to compare the results against")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Accepted slowdown before a regression (0.5 = 50%%)")
+    parser.add_argument("--run", nargs="+", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.run:
+        kind, path = args.run
+
+        metrics = run_batch_case(Path(path), args.repeat) if kind == "batch" else run_binary_case(Path(path), args.repeat)
+
+        return print(json.dumps(metrics))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+
+    results, regressions = {}, []
+
+    with tempfile.TemporaryDirectory(prefix="ncducolors-benchmark-") as directory:
+        directory = Path(directory)
+
+        for size in args.sizes.split(","):
+            for byteorder in ("little", "big"):
+                for darkbg in (True, False):
+                    name = f"{size}-{byteorder}-{'darkbg' if darkbg else 'nodarkbg'}"
+                    path = directory / name
+
+                    build(path, size=parse_size(size), byteorder=byteorder, darkbg=darkbg)
+
+                    print(f"{name}\n  {'metric':<20} {'current':>14} {'baseline':>14} {'ratio':>9}")
+
+                    results[name] = run_isolated("binary", str(path), "--repeat", str(args.repeat))
+                    regressions += compare(name, results[name], baseline.get(name, {}), args.tolerance)
+
+                    path.unlink()
+
+        name = f"batch-{BATCH_BINARIES}x1M"
+        batch = directory / "batch"
+        batch.mkdir()
+
+        build(batch / "ncdu-0", size=1 << 20)
+
+        for i in range(1, BATCH_BINARIES):
+            shutil.copy(batch / "ncdu-0", batch / f"ncdu-{i}")
+
+        print(f"{name}\n  {'metric':<20} {'current':>14} {'baseline':>14} {'ratio':>9}")
+
+        results[name] = run_isolated("batch", str(batch), "--repeat", str(args.repeat))
+        regressions += compare(name, results[name], baseline.get(name, {}), args.tolerance)
+
+    if args.update_baseline:
+        results = {name: {metric: round(value, 6) for metric, value in metrics.items()} for name, metrics in results.items()}
+
+        args.baseline.write_text(json.dumps(baseline | results, indent=4) + "\n")
+
+        print(f"Baseline updated ({str(args.baseline)!r}).")
+    elif regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}.")
+
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
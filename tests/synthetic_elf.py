@@ -0,0 +1,157 @@
+import argparse
+import os
+import random
+import struct
+import sys
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import Endianness  # noqa: E402
+from ncducolors.sequence import Sequence  # noqa: E402
+
+
+# A minimal executable ELF file: one PT_LOAD segment and the sections .text, .rodata (holding the theme table and the
+# version string at random offsets), .data, [.symtab, .strtab] and .shstrtab, filled with random bytes. The layout
+# follows the ELF specification only: it's written without using ncducolors.elf, which it is meant to exercise.
+
+CHUNK_SIZE = 1 << 20
+
+BASE_ADDRESS = 0x400000
+
+SHT_PROGBITS, SHT_SYMTAB, SHT_STRTAB = 1, 2, 3
+SHF_WRITE, SHF_ALLOC, SHF_EXECINSTR = 1, 2, 4
+
+SHSTRTAB = b"\0.text\0.rodata\0.data\0.symtab\0.strtab\0.shstrtab\0"
+STRTAB = b"\0color_defs\0"
+
+
+def write_random(file, rng: random.Random, size: int):
+    # Written a chunk at a time: a 1 GB fixture doesn't need 1 GB of memory
+    while size:
+        file.write(rng.randbytes(min(size, CHUNK_SIZE)))
+
+        size -= min(size, CHUNK_SIZE)
+
+
+def build(path: Path, *, size: int = 1 << 20, byteorder: Endianness = "little", darkbg: bool = True, bits: int = 64,
+          version: Optional[str] = None, symbols: bool = False, seed: int = 0) -> int:
+    rng = random.Random(seed)
+    prefix = "<" if byteorder == "little" else ">"
+
+    table = Sequence.get_default(with_darkbg=darkbg, byteorder=byteorder)
+    version_string = f"ncdu {version or ('1.17' if darkbg else '1.15.1')} ~ Use the arrow keys to navigate, press ? for help\0".encode()
+
+    header_size, segment_size, section_size, symbol_size = (64, 56, 64, 24) if bits == 64 else (52, 32, 40, 16)
+
+    # Layout: the sections, then their headers
+    rodata_size = max(size // 4, 64 * 1024)
+    sizes = {
+        ".text": max(size - rodata_size - 4096 - 4096, 4096),
+        ".rodata": rodata_size,
+        ".data": 4096,
+        ".symtab": 2 * symbol_size if symbols else 0,
+        ".strtab": len(STRTAB),
+        ".shstrtab": len(SHSTRTAB),
+    }
+
+    offsets = {}
+    position = header_size + segment_size
+
+    for name, section_length in sizes.items():
+        position += -position % 16
+        offsets[name] = position
+        position += section_length
+
+    section_headers = position + -position % 8
+    total = section_headers + 7 * section_size
+
+    table_offset = offsets[".rodata"] + rng.randrange(0, rodata_size - len(table)) // 8 * 8
+
+    # The version string must not overlap the table
+    while True:
+        version_offset = offsets[".rodata"] + rng.randrange(0, rodata_size - len(version_string))
+
+        if version_offset + len(version_string) <= table_offset or version_offset >= table_offset + len(table):
+            break
+
+    with open(path, "wb") as file:
+        ident = b"\x7fELF" + bytes((2 if bits == 64 else 1, 1 if byteorder == "little" else 2, 1)) + bytes(9)
+
+        if bits == 64:
+            file.write(ident + struct.pack(prefix + "HHIQQQIHHHHHH", 2, 62, 1, BASE_ADDRESS, header_size, section_headers, 0,
+                                           header_size, segment_size, 1, section_size, 7, 6))
+            file.write(struct.pack(prefix + "IIQQQQQQ", 1, 5, 0, BASE_ADDRESS, BASE_ADDRESS, total, total, 0x1000))
+        else:
+            file.write(ident + struct.pack(prefix + "HHIIIIIHHHHHH", 2, 3, 1, BASE_ADDRESS, header_size, section_headers, 0,
+                                           header_size, segment_size, 1, section_size, 7, 6))
+            file.write(struct.pack(prefix + "IIIIIIII", 1, 0, BASE_ADDRESS, BASE_ADDRESS, total, total, 5, 0x1000))
+
+        for name in (".text", ".rodata", ".data"):
+            file.write(bytes(offsets[name] - file.tell()))
+            write_random(file, rng, sizes[name])
+
+        file.write(bytes(offsets[".symtab"] - file.tell()))
+
+        if symbols:
+            address = BASE_ADDRESS + table_offset
+
+            if bits == 64:
+                file.write(struct.pack(prefix + "IBBHQQ", 0, 0, 0, 0, 0, 0) + struct.pack(prefix + "IBBHQQ", 1, 1, 0, 2, address, len(table)))
+            else:
+                file.write(struct.pack(prefix + "IIIBBH", 0, 0, 0, 0, 0, 0) + struct.pack(prefix + "IIIBBH", 1, address, len(table), 1, 0, 2))
+
+        for name, content in ((".strtab", STRTAB), (".shstrtab", SHSTRTAB)):
+            file.write(bytes(offsets[name] - file.tell()) + content)
+
+        file.write(bytes(section_headers - file.tell()))
+
+        # name, type, flags, address, offset, size, link, info, alignment, entry size
+        sections = [(0,) * 10]
+
+        for name, section_type, flags in ((".text", SHT_PROGBITS, SHF_ALLOC | SHF_EXECINSTR), (".rodata", SHT_PROGBITS, SHF_ALLOC),
+                                          (".data", SHT_PROGBITS, SHF_ALLOC | SHF_WRITE), (".symtab", SHT_SYMTAB, 0),
+                                          (".strtab", SHT_STRTAB, 0), (".shstrtab", SHT_STRTAB, 0)):
+            address = BASE_ADDRESS + offsets[name] if flags else 0
+
+            sections.append((SHSTRTAB.index(name.encode() + b"\0"), section_type, flags, address, offsets[name], sizes[name],
+                             5 if name == ".symtab" else 0, 0, 8, symbol_size if name == ".symtab" else 0))
+
+        for section in sections:
+            file.write(struct.pack(prefix + ("IIQQQQIIQQ" if bits == 64 else "IIIIIIIIII"), *section))
+
+        file.seek(table_offset)
+        file.write(table)
+
+        file.seek(version_offset)
+        file.write(version_string)
+
+    os.chmod(path, 0o755)
+
+    return table_offset
+
+
+def parse_size(size: str) -> int:
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+    return int(size[:-1]) * units[size[-1].upper()] if size[-1:].upper() in units else int(size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate an ELF file embedding Ncdu's default theme table")
+    parser.add_argument("path", type=Path, help="Path of the file to generate")
+    parser.add_argument("--size", type=parse_size, default=1 << 20, help="Approximate size (e.g. 1M, 1G)")
+    parser.add_argument("--big-endian", dest="byteorder", action="store_const", const="big", default="little")
+    parser.add_argument("--without-darkbg", dest="darkbg", action="store_false", help="Ncdu < 1.17 table (two themes)")
+    parser.add_argument("--32-bit", dest="bits", action="store_const", const=32, default=64)
+    parser.add_argument("--symbols", action="store_true", help="List the table in the symbol table (as unstripped builds)")
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+
+    print(build(args.path, size=args.size, byteorder=args.byteorder, darkbg=args.darkbg, bits=args.bits, symbols=args.symbols, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import sys
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.__main__ import Handlers  # noqa: E402
+from ncducolors.archive import AR_HEADER_SIZE, AR_MAGIC, patch_archive  # noqa: E402
+from ncducolors.batch import audit_target  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+WRAPPER = b"#!/bin/sh\nexec /usr/lib/ncdu/ncdu \"$@\"\n"
+
+
+def make_tar(files: dict[str, bytes], compression: str = "") -> bytes:
+    buffer = io.BytesIO()
+
+    with tarfile.open(fileobj=buffer, mode=f"w:{compression}", format=tarfile.GNU_FORMAT) as archive:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size, info.mode = len(content), 0o755
+
+            archive.addfile(info, io.BytesIO(content))
+
+    return buffer.getvalue()
+
+
+def make_deb(members: dict[str, bytes]) -> bytes:
+    deb = bytearray(AR_MAGIC)
+
+    for name, content in members.items():
+        deb += f"{name:<16}{0:<12}{0:<6}{0:<6}{100644:<8}{len(content):<10}`\n".encode("ascii") + content + b"\n" * (len(content) % 2)
+
+    return bytes(deb)
+
+
+def read_deb(deb: bytes) -> dict[str, bytes]:
+    members, position = {}, len(AR_MAGIC)
+
+    while position < len(deb):
+        header = deb[position: position + AR_HEADER_SIZE]
+        size = int(header[48:58])
+
+        members[header[:16].decode("ascii").strip()] = deb[position + AR_HEADER_SIZE: position + AR_HEADER_SIZE + size]
+        position += AR_HEADER_SIZE + size + size % 2
+
+    return members
+
+
+def read_tar(content: bytes) -> dict[str, bytes]:
+    with tarfile.open(fileobj=io.BytesIO(content)) as archive:
+        return {member.name: archive.extractfile(member).read() for member in archive.getmembers() if member.isfile()}
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.root = Path(self.directory.name)
+
+        build(self.root / "ncdu", size=1 << 16)
+        self.binary = (self.root / "ncdu").read_bytes()
+
+        with NcduColors(ncdu=self.root / "ncdu", execute=False) as target:
+            self.config = target.extract_default_config()
+            self.config.dark.default.fg = Color.RED
+
+        (self.root / "config.json").write_text(json.dumps(self.config.as_dict()))
+
+        self.files = {"usr/lib/ncdu/ncdu": self.binary, "usr/bin/ncdu": WRAPPER, "usr/share/doc/ncdu/README": b"ncdu\n" * 100}
+
+    def patch(self, archive: bytes) -> tuple[bytes, list[dict]]:
+        destination = io.BytesIO()
+
+        results = list(patch_archive(io.BufferedReader(io.BytesIO(archive)), destination, self.config))
+
+        return destination.getvalue(), results
+
+    def assert_patched(self, files: dict[str, bytes]):
+        self.assertEqual(files["usr/bin/ncdu"], WRAPPER)
+        self.assertEqual(files["usr/share/doc/ncdu/README"], self.files["usr/share/doc/ncdu/README"])
+
+        (path := self.root / "patched").write_bytes(files["usr/lib/ncdu/ncdu"])
+
+        with NcduColors(ncdu=path, execute=False) as target:
+            self.assertEqual(audit_target(target, self.config)["status"], "ok")
+
+    def test_tar(self):
+        archive = make_tar(self.files)
+        patched, results = self.patch(archive)
+
+        self.assertEqual([(result["member"], result["status"]) for result in results], [("usr/lib/ncdu/ncdu", "changed")])
+        self.assert_patched(read_tar(patched))
+
+        # Only the table's bytes changed
+        self.assertEqual(len(patched), len(archive))
+        self.assertEqual(sum(a != b for a, b in zip(archive, patched)), results[0]["bytes_written"])
+
+    def test_tar_gz(self):
+        patched, results = self.patch(make_tar(self.files, "gz"))
+
+        self.assertEqual(patched[:2], b"\x1f\x8b")
+        self.assertEqual(len(results), 1)
+        self.assert_patched(read_tar(gzip.decompress(patched)))
+
+    def test_deb(self):
+        deb = make_deb({"debian-binary": b"2.0\n", "control.tar.gz": make_tar({"control": b"Package: ncdu\n"}, "gz"),
+                        "data.tar.xz": make_tar(self.files, "xz")})
+
+        patched, results = self.patch(deb)
+        members = read_deb(patched)
+
+        self.assertEqual(list(members), ["debian-binary", "control.tar.gz", "data.tar.xz"])
+        self.assertEqual(members["control.tar.gz"], read_deb(deb)["control.tar.gz"])
+        self.assertEqual(len(results), 1)
+        self.assert_patched(read_tar(lzma.decompress(members["data.tar.xz"])))
+
+    def test_deb_md5sums(self):
+        md5sums = "".join(f"{hashlib.md5(content).hexdigest()}  {name}\n" for name, content in self.files.items()).encode()
+
+        for compression in ("gz", "xz", ""):
+            with self.subTest(compression=compression or "none"):
+                control = {"control": b"Package: ncdu\n", "md5sums": md5sums}
+                deb = make_deb({"debian-binary": b"2.0\n", f"control.tar{'.' * bool(compression)}{compression}": make_tar(control, compression),
+                                "data.tar.gz": make_tar({f"./{name}": content for name, content in self.files.items()}, "gz")})
+
+                patched, results = self.patch(deb)
+                members = read_deb(patched)
+
+                data = read_tar(gzip.decompress(members["data.tar.gz"]))
+                control = read_tar(members[f"control.tar{'.' * bool(compression)}{compression}"])
+
+                self.assertEqual(len(results), 1)
+                self.assertEqual(results[0]["md5"], hashlib.md5(data["./usr/lib/ncdu/ncdu"]).hexdigest())
+
+                # As debsums checks it
+                self.assertEqual(control["md5sums"].decode().splitlines(),
+                                 [f"{hashlib.md5(data[f'./{name}']).hexdigest()}  {name}" for name in self.files])
+                self.assertNotEqual(control["md5sums"], md5sums)
+                self.assertEqual(control["control"], b"Package: ncdu\n")
+
+    def test_not_elf(self):
+        # Only the wrapper script: nothing to patch, and nothing changed
+        archive = make_tar({"usr/bin/ncdu": WRAPPER})
+
+        self.assertEqual(self.patch(archive), (archive, []))
+
+    def test_output_left_untouched(self):
+        output = self.root / "out.tar"
+        output.write_bytes(b"previous")
+
+        for name, files in (("script", {"usr/bin/ncdu": WRAPPER}), ("malformed", {"usr/bin/ncdu": b"\x7fELF" + bytes(16)})):
+            with self.subTest(name):
+                (self.root / "in.tar").write_bytes(make_tar(files))
+
+                with self.assertRaises(ValueError):
+                    Handlers.patch_archive(open(self.root / "config.json", "rb"), open(self.root / "in.tar", "rb"), output, member=None,
+                                           execute=False, cache=None, backups=None)
+
+                self.assertEqual(output.read_bytes(), b"previous")
+                self.assertEqual(sorted(path.name for path in self.root.iterdir()), ["config.json", "in.tar", "ncdu", "out.tar"])
+
+    def test_output(self):
+        output = self.root / "out.tar"
+
+        (self.root / "in.tar").write_bytes(make_tar(self.files))
+
+        Handlers.patch_archive(open(self.root / "config.json", "rb"), open(self.root / "in.tar", "rb"), output, member=None,
+                               execute=False, cache=None, backups=None)
+
+        self.assert_patched(read_tar(output.read_bytes()))
+
+    def test_standard_output(self):
+        (self.root / "in.tar").write_bytes(make_tar(self.files))
+
+        stdout = io.TextIOWrapper(io.BytesIO())
+
+        with mock.patch.object(sys, "stdout", stdout):
+            Handlers.patch_archive(open(self.root / "config.json", "rb"), open(self.root / "in.tar", "rb"), Path("-"), member=None,
+                                   execute=False, cache=None, backups=None)
+
+        # Still usable
+        self.assertFalse(stdout.closed)
+        self.assert_patched(read_tar(stdout.buffer.getvalue()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.artifacts import ArtifactStore  # noqa: E402
+from ncducolors.batch import apply_many, apply_target, audit_target  # noqa: E402
+from ncducolors.cache import Cache  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from ncducolors.journal import apply_transaction  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+def put_many(path: str, root: str, process: int, count: int):
+    store = ArtifactStore(Path(path))
+
+    for i in range(count):
+        (binary := Path(root) / f"binary-{process}-{i}").write_bytes(f"patched-{process}-{i}".encode() * 64)
+
+        store.put(f"{process:02x}{i:030x}", binary, offset=0, length=16)
+
+
+class ArtifactStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.root = Path(self.directory.name)
+        self.store = ArtifactStore(self.root / "artifacts")
+
+        # The same binary, installed on three hosts
+        self.paths = [self.root / f"n{i}" for i in range(1, 4)]
+
+        build(self.paths[0], size=1 << 16)
+        self.original = self.paths[0].read_bytes()
+
+        for path in self.paths[1:]:
+            shutil.copy2(self.paths[0], path)
+
+        with NcduColors(ncdu=self.paths[0], execute=False) as target:
+            self.red = target.extract_default_config()
+            self.red.dark.default.fg = Color.RED
+
+            self.blue = target.extract_default_config()
+            self.blue.dark.default.fg = Color.BLUE
+
+    def audit(self, path: Path, config) -> str:
+        with NcduColors(ncdu=path, execute=False) as target:
+            return audit_target(target, config)["status"]
+
+    def objects(self) -> list[Path]:
+        return list((self.store.path / "objects").glob("*/*"))
+
+    def test_materialize(self):
+        results = list(apply_many(self.paths, self.red, workers=1, execute=False, artifacts=self.store))
+
+        self.assertEqual([result["artifact"] for result in results], ["stored", *[results[1]["artifact"]] * 2])
+        self.assertIn(results[1]["artifact"], ("reflink", "copy"))
+        self.assertEqual(self.store.stats["hits"], 2)
+
+        inodes = {path.stat().st_ino for path in self.paths + self.objects()}
+
+        self.assertEqual(len(inodes), len(self.paths) + 1)
+        self.assertTrue(all(path.stat().st_nlink == 1 for path in self.paths))
+
+        for path in self.paths:
+            self.assertEqual(self.audit(path, self.red), "ok")
+
+    def test_concurrent_stores(self):
+        first, second = ArtifactStore(self.store.path), ArtifactStore(self.store.path)
+
+        list(apply_many(self.paths[:1], self.red, workers=1, execute=False, artifacts=first))
+        list(apply_many(self.paths[1:2], self.blue, workers=1, execute=False, artifacts=second))
+
+        self.assertEqual(len(ArtifactStore(self.store.path).entries), 2)
+
+    def test_concurrent_processes(self):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            for future in [executor.submit(put_many, str(self.store.path), str(self.root), process, 10) for process in range(4)]:
+                future.result()
+
+        reloaded = ArtifactStore(self.store.path)
+
+        self.assertEqual(len(reloaded.entries), 40)
+        self.assertEqual(len(self.objects()), 40)
+
+    def test_max_size_across_stores(self):
+        first, second = (ArtifactStore(self.store.path, max_size=2 * len(self.original) + 1) for _ in range(2))
+
+        list(apply_many(self.paths[:1], self.red, workers=1, execute=False, artifacts=first))
+        list(apply_many(self.paths[1:2], self.blue, workers=1, execute=False, artifacts=second))
+
+        with NcduColors(ncdu=self.root / "n3", execute=False) as target:
+            green = target.extract_default_config()
+            green.dark.default.fg = Color.GREEN
+
+        list(apply_many(self.paths[2:], green, workers=1, execute=False, artifacts=first))
+
+        # Each store only knows of its own entries: the bound applies to the merged ones, and no object is left behind
+        reloaded = ArtifactStore(self.store.path)
+
+        self.assertEqual(len(reloaded.entries), 2)
+        self.assertLessEqual(reloaded.size, reloaded.max_size)
+        self.assertEqual(sorted(path.parent.name + path.name for path in self.objects()), sorted(reloaded.entries))
+
+    def test_stats_merged(self):
+        first, second = ArtifactStore(self.store.path), ArtifactStore(self.store.path)
+
+        list(apply_many(self.paths, self.red, workers=1, execute=False, artifacts=first))
+
+        second.get("0" * 32)
+        second.save()
+
+        self.assertEqual(ArtifactStore(self.store.path).stats | {"bytes_saved": 0}, {"hits": 2, "misses": 2, "bytes_saved": 0})
+
+    def test_materialize_waits_for_writers(self):
+        list(apply_many(self.paths[:1], self.red, workers=1, execute=False, artifacts=self.store))
+
+        target = NcduColors(ncdu=self.paths[1], execute=False)
+        self.addCleanup(target.close)
+
+        # A concurrent apply-config holds the lock: the materialization waits for it, then sees the binary has changed
+        fd = NcduColors.lock(self.paths[1], os.O_WRONLY)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(apply_target, target, self.red, artifacts=self.store)
+
+            time.sleep(0.2)
+            self.assertFalse(future.done())
+
+            with NcduColors(ncdu=self.paths[1], execute=False) as other:
+                os.pwrite(fd, self.blue.as_bytes(byteorder=other.byteorder), other.locate())
+
+            os.close(fd)
+
+            result = future.result()
+
+        # Patched over the other apply, not replaced by the stored binary from before it
+        self.assertEqual((result["status"], "artifact" in result), ("changed", False))
+        self.assertEqual(self.audit(self.paths[1], self.red), "ok")
+        self.assertEqual(len(self.store.entries), 1)
+
+    def test_materialize_changed_source(self):
+        list(apply_many(self.paths[:1], self.red, workers=1, execute=False, artifacts=self.store))
+
+        key = ArtifactStore.key(source=Cache.digest(self.original), config=ArtifactStore.config_digest(self.red))
+
+        with NcduColors(ncdu=self.paths[1], execute=False) as target:
+            target.apply_config(self.blue)
+
+        self.assertIsNone(self.store.materialize(key, self.paths[1], source=Cache.digest(self.original)))
+        self.assertEqual(self.audit(self.paths[1], self.blue), "ok")
+
+    def test_patching_one_target_leaves_its_siblings(self):
+        list(apply_many(self.paths, self.red, workers=1, execute=False, artifacts=self.store))
+
+        stored = self.objects()[0].read_bytes()
+
+        # A transaction patches in place: only the binary it targets may change
+        results = list(apply_transaction([self.paths[1]], self.blue, self.root / "journal", workers=1, execute=False))
+
+        self.assertEqual([result["status"] for result in results], ["changed"])
+        self.assertEqual(self.audit(self.paths[1], self.blue), "ok")
+        self.assertEqual(self.audit(self.paths[2], self.red), "ok")
+        self.assertEqual(self.objects()[0].read_bytes(), stored)
+
+        # Still valid: the next host gets the red theme
+        self.assertIsNotNone(self.store.get(ArtifactStore.key(source=Cache.digest(self.original), config=ArtifactStore.config_digest(self.red))))
+
+    def test_transaction_refuses_hard_links(self):
+        os.link(self.paths[0], link := self.root / "link")
+
+        results = list(apply_transaction([self.paths[0]], self.blue, self.root / "journal", workers=1, execute=False))
+
+        self.assertEqual([result["status"] for result in results], ["error"])
+        self.assertEqual(link.read_bytes(), self.original)
+
+    def test_write_table_replaces_hard_links(self):
+        os.link(self.paths[0], link := self.root / "link")
+
+        with NcduColors(ncdu=self.paths[0], execute=False) as target:
+            target.apply_config(self.red)
+
+        self.assertEqual(link.read_bytes(), self.original)
+        self.assertEqual(self.audit(self.paths[0], self.red), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
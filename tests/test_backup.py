@@ -0,0 +1,112 @@
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors.backup import BackupStore  # noqa: E402
+from ncducolors.cache import Cache  # noqa: E402
+
+
+def record(store: BackupStore, ncdu: Path, original: bytes = b"original", new: bytes = b"new"):
+    store.record(ncdu, version=(1, 17), byteorder="little", darkbg=True, offset=0, current=original, new=new)
+
+
+def record_many(path: str, root: str, process: int, count: int):
+    store = BackupStore(Path(path))
+
+    for i in range(count):
+        record(store, Path(root) / f"ncdu-{process}-{i}", original=f"original-{process}-{i}".encode())
+
+
+class BackupStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.root = Path(self.directory.name)
+        self.path = self.root / "backups"
+
+    def binary(self, name: str) -> Path:
+        (path := self.root / name).write_bytes(b"ncdu")
+
+        return path
+
+    def test_concurrent_stores(self):
+        first, second = BackupStore(self.path), BackupStore(self.path)
+
+        record(first, self.binary("a"))
+        record(second, self.binary("b"))
+
+        self.assertEqual(sorted(entry["path"] for entry in BackupStore(self.path)), [str(self.root / "a"), str(self.root / "b")])
+
+    def test_concurrent_processes(self):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            for future in [executor.submit(record_many, str(self.path), str(self.root), process, 25) for process in range(4)]:
+                future.result()
+
+        self.assertEqual(len(list(BackupStore(self.path))), 100)
+
+    def test_original_kept_across_stores(self):
+        ncdu = self.binary("ncdu")
+        first, second = BackupStore(self.path), BackupStore(self.path)
+
+        # Another process patched the binary after this store was loaded: it sees the patched table as the current one
+        record(first, ncdu, original=b"default", new=b"red")
+        record(second, ncdu, original=b"red", new=b"blue")
+
+        entry = BackupStore(self.path).get(ncdu)
+
+        self.assertEqual((entry["original"], entry["applied"]), (Cache.digest(b"default"), Cache.digest(b"blue")))
+
+    def test_autosave(self):
+        store = BackupStore(self.path, autosave=False)
+
+        for name in ("a", "b", "c"):
+            record(store, self.binary(name))
+
+        self.assertFalse(store.index.exists())
+
+        store.save()
+
+        self.assertEqual(len(list(BackupStore(self.path))), 3)
+
+    def test_gc(self):
+        kept, removed = self.binary("kept"), self.binary("removed")
+
+        record(BackupStore(self.path), kept, original=b"kept")
+        record(BackupStore(self.path), removed, original=b"removed")
+
+        # Loaded before another process records a backup: its gc must not delete it
+        store = BackupStore(self.path)
+        record(BackupStore(self.path), self.binary("other"), original=b"other")
+
+        removed.unlink()
+
+        # Tables of an unsaved backup (e.g. of a batch still running), younger than the grace period
+        BackupStore(self.path).put_object(b"unsaved")
+
+        old = os.stat(self.path / "index.json").st_mtime - 2 * BackupStore.GC_GRACE
+
+        for path in (self.path / "objects").glob("*/*"):
+            if path.parent.name + path.name != Cache.digest(b"unsaved"):
+                os.utime(path, (old, old))
+
+        self.assertEqual(store.gc(), (1, 1))
+
+        reloaded = BackupStore(self.path)
+
+        self.assertEqual(sorted(entry["path"] for entry in reloaded), [str(kept), str(self.root / "other")])
+
+        for table in (b"kept", b"other", b"new", b"unsaved"):
+            self.assertEqual(reloaded.get_object(Cache.digest(table)), table)
+
+        with self.assertRaises(FileNotFoundError):
+            reloaded.get_object(Cache.digest(b"removed"))
+
+
+if __name__ == "__main__":
+    unittest.main()
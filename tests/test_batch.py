@@ -0,0 +1,65 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.batch import apply_many, audit_many  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from ncducolors.config import Config  # noqa: E402
+from ncducolors.journal import apply_transaction  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.root = Path(self.directory.name)
+        self.paths = [self.root / f"ncdu-{i}" for i in range(3)]
+
+        for i, path in enumerate(self.paths):
+            build(path, size=1 << 16, darkbg=i != 2, seed=i)
+
+        with NcduColors(ncdu=self.paths[0], execute=False) as target:
+            default = target.extract_default_config()
+
+        # A config written for Ncdu < 1.17: it has no darkbg theme
+        self.config = Config(ncdu=None, offset=None, off=default.off, dark=default.dark)
+        self.config.dark.default.fg = Color.RED
+
+    def audit(self, config) -> list[str]:
+        return [result["status"] for result in sorted(audit_many(self.paths, config, workers=1, execute=False), key=lambda result: result["path"])]
+
+    def darkbg(self, path: Path) -> dict:
+        with NcduColors(ncdu=path, execute=False) as target:
+            return target.load_config(offset=None).darkbg.as_dict()
+
+    def test_apply_then_audit_without_darkbg(self):
+        # Patched by hand beforehand: the darkbg theme kept is the binary's current one, not the default one
+        with NcduColors(ncdu=self.paths[1], execute=False) as target:
+            patched = target.extract_default_config()
+            patched.darkbg.default.fg = Color.BLUE
+
+            target.apply_config(patched)
+
+        self.assertEqual(self.audit(self.config), ["drift"] * 3)
+
+        results = list(apply_many(self.paths, self.config, workers=1, execute=False))
+
+        self.assertEqual([result["status"] for result in results], ["changed"] * 3)
+        self.assertEqual(self.audit(self.config), ["ok"] * 3)
+        self.assertEqual(self.darkbg(self.paths[1]), patched.darkbg.as_dict())
+
+    def test_transaction_then_audit_without_darkbg(self):
+        results = list(apply_transaction(self.paths, self.config, self.root / "journal", workers=1, execute=False))
+
+        self.assertEqual([result["status"] for result in results], ["changed"] * 3)
+        self.assertEqual(self.audit(self.config), ["ok"] * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
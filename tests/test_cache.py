@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors.cache import Cache  # noqa: E402
+
+
+TABLE = bytes(range(32))
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.root = Path(self.directory.name)
+        self.cache = Cache(self.root / "binaries.json", autosave=False)
+
+    def binary(self, name: str, content: bytes = TABLE) -> Path:
+        path = self.root / name
+        path.write_bytes(content)
+
+        return path
+
+    def put(self, path: Path):
+        self.cache.put(path, path.read_bytes(), version=(1, 17), byteorder="little", darkbg=True, offset=0, length=len(TABLE))
+
+    def test_get(self):
+        path = self.binary("ncdu")
+        self.put(path)
+
+        self.assertEqual(self.cache.get(path, path.read_bytes(), "little")["offset"], 0)
+        self.assertIsNone(self.cache.get(path, path.read_bytes(), "big"))
+
+    def test_older_version_evicted(self):
+        path = self.binary("ncdu")
+        self.put(path)
+
+        path.write_bytes(TABLE + b"\0")
+        os.utime(path, ns=(0, 0))
+        self.put(path)
+
+        self.assertEqual([entry["path"] for entry in self.cache.entries.values()], [str(path)])
+
+    def test_put_doesnt_stat_other_entries(self):
+        paths = [self.binary(f"ncdu-{i}") for i in range(64)]
+
+        for path in paths[:-1]:
+            self.put(path)
+
+        with mock.patch.object(Path, "exists", side_effect=AssertionError("stat of a cached binary")):
+            self.put(paths[-1])
+
+        self.assertEqual(len(self.cache.entries), len(paths))
+
+    def test_autosave_doesnt_stat_other_entries(self):
+        cache = Cache(self.root / "autosaved.json")
+        paths = [self.binary(f"ncdu-{i}") for i in range(64)]
+
+        for path in paths[:-1]:
+            cache.put(path, TABLE, version=(1, 17), byteorder="little", darkbg=True, offset=0, length=len(TABLE))
+
+        with mock.patch.object(Path, "exists", side_effect=AssertionError("stat of a cached binary")):
+            cache.put(paths[-1], TABLE, version=(1, 17), byteorder="little", darkbg=True, offset=0, length=len(TABLE))
+
+        self.assertEqual(len(Cache(cache.path).entries), len(paths))
+
+    def test_stale_entries_pruned_on_save(self):
+        kept, removed = self.binary("kept"), self.binary("removed")
+
+        self.put(kept)
+        self.put(removed)
+
+        removed.unlink()
+        self.cache.save()
+
+        self.assertEqual([entry["path"] for entry in Cache(self.cache.path).entries.values()], [str(kept)])
+
+    def test_max_entries(self):
+        with mock.patch.object(Cache, "MAX_ENTRIES", 4):
+            paths = [self.binary(f"ncdu-{i}") for i in range(6)]
+
+            for path in paths:
+                self.put(path)
+
+        self.assertEqual(sorted(entry["path"] for entry in self.cache.entries.values()), sorted(map(str, paths[2:])))
+
+
+if __name__ == "__main__":
+    unittest.main()
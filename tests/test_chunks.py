@@ -0,0 +1,113 @@
+import mmap
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from ncducolors.search import Locator, Matcher  # noqa: E402
+from ncducolors.sequence import Sequence  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+# One page per window (see NcduColors.window) and four windows per chunk: a 64 KiB .rodata is searched in 4 chunks
+WORKERS = 2
+MEMORY = 2 * mmap.PAGESIZE
+CHUNK_WINDOWS = 4
+CHUNK_SIZE = mmap.PAGESIZE * CHUNK_WINDOWS
+
+
+class ChunksTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.path = Path(self.directory.name) / "ncdu"
+
+        # Every search of these tests is a parallel one
+        for name, value in (("PARALLEL_THRESHOLD", 0), ("CHUNK_WINDOWS", CHUNK_WINDOWS)):
+            patcher = mock.patch.object(NcduColors, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def build(self, *positions: int) -> list[int]:
+        # The table is moved to the given positions in .rodata (from its end, if negative), e.g. straddling the boundaries
+        table_offset = build(self.path, size=1 << 16, version="1.17")
+
+        with NcduColors(ncdu=self.path, execute=False) as target:
+            rodata, length = target.elf.sections_named(".rodata")[0], target.table_length
+
+        positions = [position if position >= 0 else rodata.size + position for position in positions]
+        start = rodata.offset
+
+        binary = bytearray(self.path.read_bytes())
+        table = binary[table_offset: table_offset + length]
+
+        binary[table_offset: table_offset + length] = bytes(length)
+
+        for position in positions:
+            binary[start + position: start + position + length] = table
+
+        self.path.write_bytes(binary)
+
+        return [start + position for position in positions]
+
+    def scan(self, workers: int, matcher=None, **kwargs) -> list:
+        # Only the search under test runs (parallel with more than one worker), with windows of the same size either way
+        other = mock.patch.object(NcduColors, "_search_windows", side_effect=AssertionError("sequential search")) \
+            if workers > 1 else mock.patch.object(NcduColors, "_search_chunks", side_effect=AssertionError("parallel search"))
+
+        with other, NcduColors(ncdu=self.path, execute=False, workers=workers, memory=workers * MEMORY) as target:
+            self.assertEqual(target.window, mmap.PAGESIZE)
+
+            return target.scan(matcher or Locator(byteorder=target.byteorder), **kwargs)
+
+    def assert_found(self, offsets: list[int]):
+        for matcher in (None, Matcher()):
+            with self.subTest(matcher=type(matcher).__name__):
+                matches = self.scan(WORKERS, matcher)
+
+                self.assertEqual([match.offset for match in matches], offsets)
+                self.assertEqual(matches, self.scan(1, matcher))
+
+    def test_chunk_boundary(self):
+        self.assert_found(self.build(2 * CHUNK_SIZE - 100))
+
+    def test_window_boundary(self):
+        # Within a chunk: found whole by the window it starts in
+        self.assert_found(self.build(CHUNK_SIZE + mmap.PAGESIZE - 100))
+
+    def test_chunk_starts(self):
+        # At the very start of a chunk (found by it, not by the previous chunk's overlap), and at the very end of .rodata
+        self.assert_found(self.build(CHUNK_SIZE, -len(Sequence.get_default(with_darkbg=True, byteorder="little"))))
+
+    def test_early_stop(self):
+        offsets = self.build(CHUNK_SIZE - 100, 3 * CHUNK_SIZE - 100)
+
+        matches = self.scan(WORKERS, until=lambda match: True)
+
+        self.assertEqual([match.offset for match in matches], offsets[:1])
+        self.assertEqual(matches, self.scan(1, until=lambda match: True))
+
+    def test_locate_and_apply(self):
+        offset, = self.build(2 * CHUNK_SIZE - 100)
+
+        with NcduColors(ncdu=self.path, execute=False, workers=WORKERS, memory=WORKERS * MEMORY) as target:
+            config = target.extract_default_config()
+            config.dark.default.fg = Color.RED
+
+            self.assertEqual(config.offset, offset)
+
+            target.apply_config(config)
+
+        # Patched: found by its structure only
+        with NcduColors(ncdu=self.path, execute=False, workers=WORKERS, memory=WORKERS * MEMORY) as target:
+            self.assertEqual(target.locate(), offset)
+
+
+if __name__ == "__main__":
+    unittest.main()
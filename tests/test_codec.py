@@ -0,0 +1,131 @@
+import struct
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.codec import Codec  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from ncducolors.key import Key  # noqa: E402
+from ncducolors.sequence import Sequence  # noqa: E402
+from ncducolors.theme import Theme  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+LAYOUTS = [(byteorder, darkbg) for byteorder in ("little", "big") for darkbg in (True, False)]
+
+
+class CodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        for byteorder, darkbg in LAYOUTS:
+            with self.subTest(byteorder=byteorder, darkbg=darkbg):
+                table = Sequence.get_default(with_darkbg=darkbg, byteorder=byteorder)
+                themes = 3 if darkbg else 2
+
+                values = Codec.decode(table, themes=themes, byteorder=byteorder)
+
+                self.assertEqual(len(values), len(Theme.KEYS) * themes * 3)
+                self.assertEqual(Codec.encode(values, themes=themes, byteorder=byteorder), table)
+
+                # At an offset, and the other byte order's table is the same values
+                self.assertEqual(Codec.decode(b"\0" * 7 + table, offset=7, themes=themes, byteorder=byteorder), values)
+                self.assertEqual(Codec.decode(Sequence.get_default(with_darkbg=darkbg, byteorder="big" if byteorder == "little" else "little"),
+                                              themes=themes, byteorder="big" if byteorder == "little" else "little"), values)
+
+    def test_encode_into(self):
+        for byteorder, darkbg in LAYOUTS:
+            with self.subTest(byteorder=byteorder, darkbg=darkbg):
+                table = Sequence.get_default(with_darkbg=darkbg, byteorder=byteorder)
+                themes = 3 if darkbg else 2
+
+                buffer = bytearray(b"\xff" * (len(table) + 10))
+                Codec.encode_into(buffer, Codec.decode(table, themes=themes, byteorder=byteorder), offset=7, themes=themes, byteorder=byteorder)
+
+                self.assertEqual(bytes(buffer), b"\xff" * 7 + table + b"\xff" * 3)
+
+                with self.assertRaises(struct.error):
+                    Codec.encode_into(bytearray(len(table) - 1), Codec.decode(table, themes=themes, byteorder=byteorder), themes=themes,
+                                      byteorder=byteorder)
+
+    def test_swap(self):
+        for byteorder, darkbg in LAYOUTS:
+            with self.subTest(byteorder=byteorder, darkbg=darkbg):
+                other = "big" if byteorder == "little" else "little"
+
+                config = NcduColors.dump_internal_default_config(with_darkbg=darkbg, byteorder=byteorder)
+                config.dark.default.fg = Color.COLOR208
+
+                table = config.as_bytes(byteorder=byteorder)
+                swapped = Codec.swap(table, themes=3 if darkbg else 2, byteorder=byteorder)
+
+                self.assertEqual(swapped, config.as_bytes(byteorder=other))
+                self.assertEqual(Codec.swap(swapped, themes=3 if darkbg else 2, byteorder=other), table)
+
+    def test_truncated(self):
+        table = Sequence.get_default(with_darkbg=True, byteorder="little")
+
+        for binary, offset in ((table[:-1], 0), (table, 1), (table, -1)):
+            with self.subTest(length=len(binary), offset=offset):
+                with self.assertRaises(ValueError):
+                    Codec.decode(binary, offset=offset, themes=3)
+
+    def test_config_round_trip(self):
+        for byteorder, darkbg in LAYOUTS:
+            with self.subTest(byteorder=byteorder, darkbg=darkbg):
+                config = NcduColors.dump_internal_default_config(with_darkbg=darkbg, byteorder=byteorder)
+
+                self.assertEqual(config.as_bytes(byteorder=byteorder), Sequence.get_default(with_darkbg=darkbg, byteorder=byteorder))
+
+                config.dark.default.fg = Color.COLOR208
+                table = config.as_bytes(byteorder=byteorder)
+
+                themes = NcduColors.binary_to_themes(binary=table, offset=0, supports_darkbg=darkbg, byteorder=byteorder)
+
+                self.assertIs(themes[1].default.fg, Color.COLOR208)
+                self.assertEqual([theme.as_dict() for theme in themes], [config.off.as_dict(), config.dark.as_dict()] +
+                                 ([config.darkbg.as_dict()] if darkbg else []))
+
+    def test_key(self):
+        for byteorder, darkbg in LAYOUTS:
+            with self.subTest(byteorder=byteorder, darkbg=darkbg):
+                config = NcduColors.dump_internal_default_config(with_darkbg=darkbg, byteorder=byteorder)
+                table = Sequence.get_default(with_darkbg=darkbg, byteorder=byteorder)
+
+                keys = b"".join(getattr(theme, key).as_bytes(byteorder=byteorder) for key in Theme.KEYS
+                                for theme in ((config.off, config.dark, config.darkbg) if darkbg else (config.off, config.dark)))
+
+                self.assertEqual(keys, table)
+                self.assertEqual(Key.from_dict(config.dark.default.as_dict()).as_bytes(byteorder=byteorder),
+                                 config.dark.default.as_bytes(byteorder=byteorder))
+
+    def test_binaries(self):
+        # The table layout doesn't depend on the ELF class: 32-bit binaries hold the same table
+        with tempfile.TemporaryDirectory(prefix="ncducolors-test-") as directory:
+            path = Path(directory) / "ncdu"
+
+            for bits in (64, 32):
+                for byteorder, darkbg in LAYOUTS:
+                    with self.subTest(bits=bits, byteorder=byteorder, darkbg=darkbg):
+                        table_offset = build(path, size=1 << 16, bits=bits, byteorder=byteorder, darkbg=darkbg)
+
+                        with NcduColors(ncdu=path, execute=False) as target:
+                            config = target.extract_default_config()
+
+                            self.assertEqual(config.offset, table_offset)
+                            self.assertEqual(config.as_bytes(byteorder=byteorder),
+                                             path.read_bytes()[table_offset: table_offset + target.table_length])
+
+                            config.dark.default.fg = Color.RED
+
+                            target.apply_config(config)
+
+                        with NcduColors(ncdu=path, execute=False) as target:
+                            self.assertEqual(target.load_config(offset=table_offset).as_bytes(byteorder=byteorder),
+                                             config.as_bytes(byteorder=byteorder))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors.elf import Elf  # noqa: E402
+from ncducolors.sequence import Sequence  # noqa: E402
+from synthetic_elf import BASE_ADDRESS, build  # noqa: E402
+
+
+LAYOUTS = [(bits, byteorder) for bits in (64, 32) for byteorder in ("little", "big")]
+
+
+class ElfTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+    def build(self, **kwargs) -> tuple[Elf, int, bytes]:
+        path = Path(self.directory.name) / "ncdu"
+        table_offset = build(path, size=1 << 16, **kwargs)
+
+        return Elf(path.read_bytes()), table_offset, path.read_bytes()
+
+    def test_header(self):
+        for bits, byteorder in LAYOUTS:
+            with self.subTest(bits=bits, byteorder=byteorder):
+                elf, _, _ = self.build(bits=bits, byteorder=byteorder)
+
+                self.assertEqual(elf.bits, bits)
+                self.assertEqual(elf.byteorder, byteorder)
+
+    def test_sections(self):
+        for bits, byteorder in LAYOUTS:
+            with self.subTest(bits=bits, byteorder=byteorder):
+                elf, table_offset, binary = self.build(bits=bits, byteorder=byteorder)
+
+                self.assertEqual([section.name for section in elf.sections],
+                                 ["", ".text", ".rodata", ".data", ".symtab", ".strtab", ".shstrtab"])
+                self.assertEqual([section.name for section in elf.data_sections()], [".rodata", ".data"])
+                self.assertEqual([section.name for section in elf.sections_named(".rodata")], [".rodata"])
+
+                rodata = elf.sections[2]
+
+                self.assertEqual(rodata.type, Elf.SHT_PROGBITS)
+                self.assertLessEqual(rodata.end, len(binary))
+                self.assertEqual(elf.section_at(table_offset), rodata)
+                self.assertIsNone(elf.section_at(len(binary) + 1))
+
+    def test_segments(self):
+        for bits, byteorder in LAYOUTS:
+            with self.subTest(bits=bits, byteorder=byteorder):
+                elf, table_offset, binary = self.build(bits=bits, byteorder=byteorder)
+
+                self.assertEqual(len(elf.segments), 1)
+                self.assertEqual(elf.segments[0].type, Elf.PT_LOAD)
+                self.assertEqual((elf.segments[0].offset, elf.segments[0].address), (0, BASE_ADDRESS))
+
+                self.assertEqual(elf.address_to_offset(BASE_ADDRESS + table_offset), table_offset)
+                self.assertIsNone(elf.address_to_offset(BASE_ADDRESS - 1))
+                self.assertIsNone(elf.address_to_offset(BASE_ADDRESS + elf.segments[0].filesz))
+
+    def test_symbols(self):
+        for bits, byteorder in LAYOUTS:
+            with self.subTest(bits=bits, byteorder=byteorder):
+                elf, table_offset, _ = self.build(bits=bits, byteorder=byteorder, symbols=True)
+
+                symbol = elf.find_symbol("color_defs")
+
+                self.assertIsNotNone(symbol)
+                self.assertEqual(symbol.address, BASE_ADDRESS + table_offset)
+                self.assertEqual(symbol.size, len(Sequence.get_default(with_darkbg=True, byteorder=byteorder)))
+
+                self.assertIsNone(elf.find_symbol("color_def"))
+                self.assertIsNone(elf.find_symbol("main"))
+
+    def test_stripped(self):
+        for bits, byteorder in LAYOUTS:
+            with self.subTest(bits=bits, byteorder=byteorder):
+                elf, _, _ = self.build(bits=bits, byteorder=byteorder, symbols=False)
+
+                self.assertIsNone(elf.find_symbol("color_defs"))
+
+    def test_malformed(self):
+        _, _, binary = self.build()
+
+        for malformed in (b"", b"\x7fELF", b"#!/bin/sh\n" + bytes(64), binary[:4] + b"\x03" + binary[5:], binary[:200]):
+            with self.subTest(malformed=malformed[:8]):
+                with self.assertRaises(ValueError):
+                    Elf(malformed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.batch import audit_target  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from ncducolors.journal import Journal, apply_transaction, resume, rollback  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+class Crash(BaseException):
+    pass
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        root = Path(self.directory.name)
+
+        self.journal = root / "journal"
+        self.paths = [root / f"ncdu-{i}" for i in range(3)]
+
+        for i, path in enumerate(self.paths):
+            build(path, size=1 << 16, seed=i)
+
+        self.defaults = [path.read_bytes() for path in self.paths]
+
+        with NcduColors(ncdu=self.paths[0], execute=False) as target:
+            self.config = target.extract_default_config()
+            self.config.dark.default.fg = Color.RED
+
+    def apply(self, workers: int = 2, **kwargs) -> list[dict]:
+        return list(apply_transaction(self.paths, self.config, self.journal, workers=workers, execute=False, **kwargs))
+
+    def crash_on(self, crashed: str):
+        append = Journal.append
+
+        def crashing(journal: Journal, record: dict, sync: bool = False):
+            if record["type"] == crashed:
+                raise Crash()
+
+            append(journal, record, sync)
+
+        return mock.patch.object(Journal, "append", crashing)
+
+    def records(self) -> list[str]:
+        return [record["type"] for record in Journal.read(self.journal)]
+
+    def audit(self) -> list[str]:
+        statuses = []
+
+        for path in self.paths:
+            with NcduColors(ncdu=path, execute=False) as target:
+                statuses.append(audit_target(target, self.config)["status"])
+
+        return statuses
+
+    def test_commit(self):
+        results = self.apply()
+
+        self.assertEqual(sorted(result["status"] for result in results), ["changed"] * 3)
+        self.assertEqual(self.records(), ["begin"] + ["patch"] * 3 + ["planned"] + ["done"] * 3 + ["commit"])
+        self.assertEqual(self.audit(), ["ok"] * 3)
+
+        # Committed: there's nothing to resume
+        self.assertEqual(list(resume(self.journal, workers=1)), [])
+
+    def test_binaries_synced_before_done(self):
+        events = []
+        fsync, append = os.fsync, Journal.append
+
+        def syncing(fd: int):
+            events.append(("fsync", os.readlink(f"/proc/self/fd/{fd}")))
+
+            fsync(fd)
+
+        def appending(journal: Journal, record: dict, sync: bool = False):
+            events.append((record["type"], record.get("path"), sync))
+
+            append(journal, record, sync)
+
+        with mock.patch("ncducolors.journal.os.fsync", syncing), mock.patch.object(Journal, "append", appending):
+            self.apply(fsync=True)
+
+        for path in map(str, self.paths):
+            synced = events.index(("fsync", path))
+
+            self.assertLess(synced, events.index(("done", path, True)))
+
+        self.assertEqual([event for event in events if event[0] != "fsync"][-1], ("commit", None, True))
+
+    def test_crash_before_commit(self):
+        with self.crash_on("commit"), self.assertRaises(Crash):
+            self.apply()
+
+        self.assertEqual(self.records()[-1], "done")
+        self.assertTrue(Journal.is_open(Journal.read(self.journal)))
+
+        # Every binary is done: resuming only commits
+        self.assertEqual(list(resume(self.journal, workers=1)), [])
+        self.assertEqual(self.records()[-1], "commit")
+        self.assertEqual(self.audit(), ["ok"] * 3)
+
+    def test_crash_before_done(self):
+        # The binaries are written, but the journal doesn't know it
+        with self.crash_on("done"), self.assertRaises(Crash):
+            self.apply(workers=1)
+
+        results = list(resume(self.journal, workers=1))
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result["status"] in ("changed", "unchanged") for result in results))
+        self.assertEqual(self.records()[-1], "commit")
+        self.assertEqual(self.audit(), ["ok"] * 3)
+
+    def test_rollback_after_crash(self):
+        with self.crash_on("commit"), self.assertRaises(Crash):
+            self.apply()
+
+        results = list(rollback(self.journal))
+
+        self.assertEqual([result["status"] for result in results], ["changed"] * 3)
+        self.assertEqual(self.records()[-1], "rollback")
+        self.assertEqual([path.read_bytes() for path in self.paths], self.defaults)
+
+        # Rolled back twice: nothing to do
+        self.assertEqual(list(rollback(self.journal)), [])
+
+    def test_crash_while_planning(self):
+        with self.crash_on("planned"), self.assertRaises(Crash):
+            self.apply()
+
+        # Nothing was written, and the plan might be incomplete: it can't be resumed, only rolled back
+        self.assertEqual([path.read_bytes() for path in self.paths], self.defaults)
+
+        with self.assertRaises(ValueError):
+            list(resume(self.journal, workers=1))
+
+        self.assertEqual([result["status"] for result in rollback(self.journal)], ["unchanged"] * 3)
+
+    def test_unfinished_transaction(self):
+        with self.crash_on("commit"), self.assertRaises(Crash):
+            self.apply()
+
+        with self.assertRaises(ValueError):
+            self.apply()
+
+    def test_torn_record(self):
+        self.apply()
+
+        with open(self.journal, "ab") as file:
+            file.write(json.dumps({"type": "begin"}).encode() + b"\n" + b'{"type": "pat')
+
+        self.assertEqual(self.records(), ["begin"])
+
+        with self.assertRaises(ValueError):
+            list(resume(self.journal, workers=1))
+
+    def test_modified_binary(self):
+        with self.crash_on("planned"), self.assertRaises(Crash):
+            self.apply()
+
+        with open(self.paths[0], "r+b") as file:
+            file.seek(self.config.offset)
+            file.write(b"\x42" * 16)
+
+        results = {result["path"]: result for result in rollback(self.journal)}
+
+        self.assertEqual(results[str(self.paths[0])]["status"], "error")
+        self.assertTrue(Journal.is_open(Journal.read(self.journal)))
+
+
+if __name__ == "__main__":
+    unittest.main()
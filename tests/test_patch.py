@@ -0,0 +1,143 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.batch import apply_target, audit_target  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from ncducolors.config import Config  # noqa: E402
+from ncducolors.patch import Patch  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+LAYOUTS = [(byteorder, darkbg) for byteorder in ("little", "big") for darkbg in (True, False)]
+
+
+def sign(body: bytes) -> bytes:
+    return body + Patch.checksum(body)
+
+
+class PatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.root = Path(self.directory.name)
+
+        self.config = NcduColors.dump_internal_default_config(with_darkbg=True)
+        self.config.dark.default.fg = Color.RED
+        self.config.darkbg.default.bg = Color.BLUE
+
+        # Written for Ncdu < 1.17
+        self.legacy = Config(ncdu=None, offset=None, off=self.config.off, dark=self.config.dark)
+
+    def test_round_trip(self):
+        for config, layouts in ((self.config, {2, 3}), (self.legacy, {2})):
+            with self.subTest(darkbg=config.darkbg is not None):
+                patch = Patch.compile(config)
+                data = patch.as_bytes()
+
+                self.assertTrue(Patch.is_patch(data))
+                self.assertEqual(Patch.from_bytes(data).tables, patch.tables)
+                self.assertEqual(Patch.from_bytes(data).as_bytes(), data)
+
+                self.assertEqual({themes for themes, _ in patch.tables}, layouts)
+                self.assertEqual(patch.keeps_darkbg, config.darkbg is None)
+
+                for byteorder in Patch.BYTEORDERS:
+                    self.assertEqual(patch.table(themes=2, byteorder=byteorder), self.legacy.as_bytes(byteorder=byteorder))
+
+    def test_corrupted(self):
+        data = bytearray(Patch.compile(self.config).as_bytes())
+        data[len(data) // 2] ^= 1
+
+        with self.assertRaisesRegex(ValueError, "checksum"):
+            Patch.from_bytes(bytes(data))
+
+    def test_truncated(self):
+        data = Patch.compile(self.config).as_bytes()
+        body = data[:-Patch.CHECKSUM_SIZE]
+
+        for truncated in (data[:-1], data[:Patch.HEADER.size], b"", sign(body[:-1]), sign(body[:Patch.HEADER.size + 2])):
+            with self.subTest(length=len(truncated)):
+                with self.assertRaises(ValueError):
+                    Patch.from_bytes(truncated)
+
+        # Trailing bytes
+        with self.assertRaisesRegex(ValueError, "malformed"):
+            Patch.from_bytes(sign(body + b"\0"))
+
+    def test_unknown_format(self):
+        body = Patch.compile(self.config).as_bytes()[:-Patch.CHECKSUM_SIZE]
+
+        with self.assertRaisesRegex(ValueError, "format 2"):
+            Patch.from_bytes(sign(Patch.HEADER.pack(Patch.MAGIC, 2, 0)))
+
+        with self.assertRaisesRegex(ValueError, "Not a compiled patch"):
+            Patch.from_bytes(sign(b"NCDUPTCX" + body[len(Patch.MAGIC):]))
+
+        table = self.legacy.as_bytes()
+
+        for themes, byteorder, length in ((4, 0, len(table)), (2, 2, len(table)), (2, 0, len(table) - 8), (3, 0, len(table))):
+            with self.subTest(themes=themes, byteorder=byteorder, length=length):
+                layout = Patch.LAYOUT.pack(themes, byteorder, length)
+
+                with self.assertRaisesRegex(ValueError, "layout"):
+                    Patch.from_bytes(sign(Patch.HEADER.pack(Patch.MAGIC, Patch.FORMAT, 1) + layout + table[:length]))
+
+    def test_same_as_config(self):
+        # Whatever the binary, and whether the config has the darkbg theme or not: the patch writes the config's table
+        for config in (self.config, self.legacy):
+            for byteorder, darkbg in LAYOUTS:
+                with self.subTest(config_darkbg=config.darkbg is not None, byteorder=byteorder, darkbg=darkbg):
+                    build(source := self.root / "source", size=1 << 16, byteorder=byteorder, darkbg=darkbg)
+
+                    # Its darkbg theme (if any) isn't the default one: it is the one to keep
+                    with NcduColors(ncdu=source, execute=False) as target:
+                        if darkbg:
+                            patched = target.extract_default_config()
+                            patched.darkbg.default.fg = Color.GREEN
+
+                            target.apply_config(patched)
+
+                    shutil.copy(source, compiled := self.root / "compiled")
+
+                    with NcduColors(ncdu=source, execute=False) as target:
+                        self.assertEqual(apply_target(target, config)["status"], "changed")
+
+                    patch = Patch.from_bytes(Patch.compile(config).as_bytes())
+
+                    with NcduColors(ncdu=compiled, execute=False) as target:
+                        self.assertEqual(apply_target(target, patch)["status"], "changed")
+
+                        self.assertEqual(audit_target(target, patch)["status"], "ok")
+                        self.assertEqual(audit_target(target, config)["status"], "ok")
+
+                    self.assertEqual(compiled.read_bytes(), source.read_bytes())
+
+                    # Through NcduColors directly too
+                    shutil.copy(self.root / "source", compiled)
+
+                    with NcduColors(ncdu=compiled, execute=False) as target:
+                        self.assertEqual(target.apply_patch(patch), 0)
+
+    def test_missing_table(self):
+        patch = Patch({(2, "little"): self.legacy.as_bytes()})
+
+        with self.assertRaises(ValueError):
+            patch.table(themes=2, byteorder="big")
+
+        # Without the current table, nothing to keep the darkbg theme of
+        with self.assertRaises(ValueError):
+            patch.table(themes=3, byteorder="little")
+
+        with self.assertRaises(ValueError):
+            patch.table(themes=3, byteorder="little", current=b"\0" * 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import random
+import struct
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from ncducolors.config import Config  # noqa: E402
+from ncducolors.search import Locator, Matcher  # noqa: E402
+from ncducolors.sequence import Sequence  # noqa: E402
+from ncducolors.theme import Theme  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+LAYOUTS = [(byteorder, darkbg) for byteorder in ("little", "big") for darkbg in (True, False)]
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.path = Path(self.directory.name) / "ncdu"
+
+    def build(self, **kwargs) -> int:
+        return build(self.path, size=1 << 16, **kwargs)
+
+    def patch(self) -> Config:
+        with NcduColors(ncdu=self.path, execute=False) as target:
+            config = target.extract_default_config()
+            config.dark.default.fg = Color.RED
+
+            target.apply_config(config)
+
+        return config
+
+    def test_matcher_default(self):
+        for byteorder, darkbg in LAYOUTS:
+            with self.subTest(byteorder=byteorder, darkbg=darkbg):
+                table_offset = self.build(byteorder=byteorder, darkbg=darkbg)
+
+                matches = list(Matcher().finditer(self.path.read_bytes()))
+
+                self.assertEqual([(match.offset, match.byteorder, match.darkbg, match.patched) for match in matches],
+                                 [(table_offset, byteorder, darkbg, False)])
+
+    def test_matcher_fingerprint(self):
+        table_offset = self.build()
+        config = self.patch()
+
+        self.assertEqual(list(Matcher().finditer(self.path.read_bytes())), [])
+
+        matches = list(Matcher({"red": config}).finditer(self.path.read_bytes()))
+
+        self.assertEqual([(match.offset, match.name, match.patched) for match in matches], [(table_offset, "red", True)])
+
+    def test_locator_hit(self):
+        for byteorder, darkbg in LAYOUTS:
+            with self.subTest(byteorder=byteorder, darkbg=darkbg):
+                table_offset = self.build(byteorder=byteorder, darkbg=darkbg)
+
+                matches = list(Locator(byteorder=byteorder).finditer(self.path.read_bytes()))
+
+                self.assertEqual([(match.offset, match.name, match.darkbg, match.patched) for match in matches],
+                                 [(table_offset, Matcher.DEFAULT, darkbg, False)])
+
+    def test_locator_patched(self):
+        for byteorder, darkbg in LAYOUTS:
+            with self.subTest(byteorder=byteorder, darkbg=darkbg):
+                table_offset = self.build(byteorder=byteorder, darkbg=darkbg)
+                self.patch()
+
+                matches = list(Locator(byteorder=byteorder).finditer(self.path.read_bytes()))
+
+                self.assertEqual([(match.offset, match.name, match.darkbg, match.patched) for match in matches],
+                                 [(table_offset, Locator.NAME, darkbg, True)])
+
+                # Found whatever the patch, without knowing the config: so by NcduColors too
+                with NcduColors(ncdu=self.path, execute=False) as target:
+                    self.assertEqual(target.locate(), table_offset)
+
+    def test_locator_miss(self):
+        rng = random.Random(0)
+
+        for byteorder in ("little", "big"):
+            with self.subTest(byteorder=byteorder):
+                locator = Locator(byteorder=byteorder)
+                key_format = locator.key_format
+
+                # Random bytes, a table of the other byte order, and rows of colorless keys without attributes
+                self.assertEqual(list(locator.finditer(rng.randbytes(1 << 16))), [])
+                self.assertEqual(list(locator.finditer(Sequence.get_default(with_darkbg=True,
+                                                                            byteorder="big" if byteorder == "little" else "little"))), [])
+                self.assertEqual(list(locator.finditer(struct.pack(key_format, -1, -1, 0) * (len(Theme.KEYS) * 3))), [])
+
+                # A truncated table
+                self.assertEqual(list(locator.finditer(Sequence.get_default(with_darkbg=False, byteorder=byteorder)[:-1])), [])
+
+    def test_locator_window(self):
+        table = Sequence.get_default(with_darkbg=True, byteorder="little")
+        binary = bytes(100) + table + bytes(100)
+
+        locator = Locator(byteorder="little")
+
+        self.assertEqual([match.offset for match in locator.finditer(binary, 0, len(binary))], [100])
+        self.assertEqual([match.offset for match in locator.finditer(binary, 101, len(binary))], [])
+        self.assertEqual([match.offset for match in locator.finditer(binary, 0, 100 + len(table) - 1)], [])
+
+    def test_symbol(self):
+        table_offset = self.build(symbols=True)
+
+        with NcduColors(ncdu=self.path, execute=False) as target:
+            self.assertEqual(target._symbol_offset(), table_offset)
+            self.assertEqual(target.locate(), table_offset)
+
+
+if __name__ == "__main__":
+    unittest.main()
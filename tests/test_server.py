@@ -0,0 +1,64 @@
+import gc
+import sys
+import tempfile
+import unittest
+import weakref
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.server import Registry  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+class RegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.paths = [Path(self.directory.name) / f"ncdu-{i}" for i in range(4)]
+
+        for i, path in enumerate(self.paths):
+            build(path, size=1 << 16, seed=i)
+
+    def test_instances_collected(self):
+        target = NcduColors(ncdu=self.paths[0], execute=False)
+        target.locate()
+        target.close()
+
+        reference = weakref.ref(target)
+        del target
+        gc.collect()
+
+        self.assertIsNone(reference())
+
+    def test_max_binaries(self):
+        registry = Registry(execute=False, max_binaries=2)
+        self.addCleanup(registry.close)
+
+        instances = [registry.run(path, lambda ncdu: {"ncdu": ncdu})["ncdu"] for path in self.paths]
+
+        self.assertEqual(list(registry.binaries), self.paths[2:])
+        self.assertTrue(all(ncdu.binary.closed for ncdu in instances[:2]))
+        self.assertFalse(any(ncdu.binary.closed for ncdu in instances[2:]))
+
+        # Used again: the most recently used one
+        registry.run(self.paths[2], lambda ncdu: {})
+        registry.run(self.paths[0], lambda ncdu: {})
+
+        self.assertEqual(list(registry.binaries), [self.paths[2], self.paths[0]])
+
+    def test_max_idle(self):
+        registry = Registry(execute=False, max_idle=0)
+        self.addCleanup(registry.close)
+
+        first = registry.run(self.paths[0], lambda ncdu: {"ncdu": ncdu})["ncdu"]
+        registry.run(self.paths[1], lambda ncdu: {})
+
+        self.assertEqual(list(registry.binaries), [self.paths[1]])
+        self.assertTrue(first.binary.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
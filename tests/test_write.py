@@ -0,0 +1,104 @@
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ncducolors import NcduColors  # noqa: E402
+from ncducolors.color import Color  # noqa: E402
+from ncducolors.config import Config  # noqa: E402
+from synthetic_elf import build  # noqa: E402
+
+
+COLORS = [Color.RED, Color.GREEN, Color.BLUE, Color.YELLOW, Color.CYAN, Color.MAGENTA, Color.WHITE, Color.BLACK]
+
+
+def config(ncdu: Path, color: Color) -> Config:
+    with NcduColors(ncdu=ncdu, execute=False) as target:
+        config = target.load_config(offset=None)
+
+    config.dark.default.fg = color
+
+    return config
+
+
+def apply_many_times(path: str, process: int, atomic: bool, count: int) -> int:
+    applied = config(Path(path), COLORS[process])
+
+    for _ in range(count):
+        with NcduColors(ncdu=Path(path), execute=False) as target:
+            target.apply_config(applied, atomic=atomic)
+
+            # Another process might have patched it since: it's the only way for its table to be any other config
+            os.sched_yield()
+
+    return count
+
+
+class WriteTableTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(prefix="ncducolors-test-")
+        self.addCleanup(self.directory.cleanup)
+
+        self.root = Path(self.directory.name)
+        self.path = self.root / "ncdu"
+
+        self.offset = build(self.path, size=1 << 16)
+
+    def table(self) -> dict:
+        with NcduColors(ncdu=self.path, execute=False) as target:
+            return target.load_config(offset=self.offset).dark.default.as_dict()
+
+    def test_replaced_and_patched_meanwhile(self):
+        for atomic in (False, True):
+            with self.subTest(atomic=atomic):
+                red, blue = config(self.path, Color.RED), config(self.path, Color.BLUE)
+
+                with NcduColors(ncdu=self.path, execute=False) as target:
+                    # Another process patches the binary atomically (replacing it) with another config
+                    with NcduColors(ncdu=self.path, execute=False) as other:
+                        other.apply_config(blue, atomic=True)
+
+                    self.assertGreater(target.apply_config(red, atomic=atomic), 0)
+                    self.assertEqual(target.load_config(offset=self.offset).dark.default.fg, Color.RED)
+
+                self.assertEqual(self.table(), red.dark.default.as_dict())
+
+    def test_replaced_by_another_binary(self):
+        red = config(self.path, Color.RED)
+
+        with NcduColors(ncdu=self.path, execute=False) as target:
+            # An upgrade: the table isn't where it was anymore
+            build(self.root / "upgrade", size=1 << 17, seed=1)
+            os.rename(self.root / "upgrade", self.path)
+
+            with self.assertRaises(ValueError):
+                target.apply_config(red)
+
+    def concurrent(self, atomic: list[bool], count: int = 20):
+        with ProcessPoolExecutor(max_workers=len(atomic)) as executor:
+            futures = [executor.submit(apply_many_times, str(self.path), process, atomic, count) for process, atomic in enumerate(atomic)]
+
+            self.assertEqual([future.result() for future in futures], [count] * len(atomic))
+
+        # The last writer's config, whole
+        self.assertIn(self.table(), [config(self.path, color).dark.default.as_dict() for color in COLORS[:len(atomic)]])
+
+        with NcduColors(ncdu=self.path, execute=False) as target:
+            self.assertEqual(target.locate(), self.offset)
+
+    def test_concurrent_in_place(self):
+        # The flock serializes the writers
+        self.concurrent([False] * 8)
+
+    def test_concurrent_atomic(self):
+        # The writers patching in place lock a file which an atomic writer then replaces: they patch the new one instead
+        self.concurrent([False, True] * 4)
+        self.concurrent([True] * 8)
+
+
+if __name__ == "__main__":
+    unittest.main()